@@ -0,0 +1,52 @@
+"""
+Measure message throughput of the DHT handlers with thousands of nodes on an in-memory
+LoopbackHub. Runs are deterministic for a given seed.
+
+Usage: python benchmarks/loopback.py [nodes] [peers per node] [stores per node]
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydemlia.dht import DHT
+from pydemlia.transport.loopback import LoopbackHub
+from pydemlia.utils.node import Node
+from pydemlia.utils.uid import UID
+
+
+def main(nodes: int = 2000, peers: int = 20, stores: int = 5, seed: int = 42):
+    rng = random.Random(seed)
+    hub = LoopbackHub(seed=seed)
+
+    start = time.perf_counter()
+    dhts = []
+    for _ in range(nodes):
+        transport = hub.create_transport()
+        node = Node(UID(bid=rng.randbytes(UID.ID_LENGTH)), ip=transport.addr[0], port=transport.addr[1])
+        dhts.append(DHT(node=node, network=transport))
+    for dht in dhts:
+        for peer in rng.sample(dhts, peers):
+            if peer is not dht:
+                dht.insert_node(peer.node)
+    print(f"setup     {nodes} nodes, {peers} peers each     {time.perf_counter() - start:8.3f} s")
+
+    def run(name, send):
+        for dht in dhts:
+            send(dht)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # Handlers print on errors
+            count = hub.run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<10}{count:>8} messages {elapsed:8.3f} s {count / elapsed:>12.0f} msg/s")
+
+    run("ping", lambda dht: [dht.ping(node) for node in dht.routing_table.get_all_nodes()])
+    run("store", lambda dht: [dht.put(UID(bid=rng.randbytes(UID.ID_LENGTH)), rng.randbytes(64)) for _ in range(stores)])
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
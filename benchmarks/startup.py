@@ -0,0 +1,51 @@
+"""
+Measure the startup cost of pydemlia: module import times in a fresh interpreter and
+construction times of the routing table and DHT.
+
+Usage: python benchmarks/startup.py
+"""
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["pydemlia.__main__", "pydemlia.routing.table", "pydemlia.dht"]
+RUNS = 10
+
+
+def import_time(module: str) -> float:
+    """Best of RUNS import times of a module in a fresh interpreter, in seconds."""
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    times = []
+    for _ in range(RUNS):
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True)
+        times.append(float(output.stdout))
+    return min(times)
+
+
+def construction_time(stmt: str, setup: str, number: int = 1000) -> float:
+    """Best of RUNS average construction times, in seconds."""
+    return min(timeit.repeat(stmt, setup, repeat=RUNS, number=number)) / number
+
+
+def main():
+    sys.path.insert(0, ROOT)
+    for module in MODULES:
+        print(f"import {module:<24} {import_time(module) * 1e3:8.3f} ms")
+
+    setup = (
+        "from pydemlia.utils.uid import UID\n"
+        "from pydemlia.utils.node import Node\n"
+        "from pydemlia.routing.table import RoutingTable\n"
+        "from pydemlia.network import ReplayNetwork\n"
+        "from pydemlia.dht import DHT\n"
+        "uid = UID(key='1' * 40)\n"
+        "node = Node(uid, ip='127.0.0.1', port=1337)\n"
+    )
+    print(f"RoutingTable()                  {construction_time('RoutingTable(uid)', setup) * 1e6:8.3f} us")
+    print(f"DHT()                           {construction_time('DHT(node, ReplayNetwork())', setup) * 1e6:8.3f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Command line entry point, e.g. `python -m pydemlia node --port 1337`.
+Only argparse is imported up front, the DHT and networking modules are loaded by the command that needs them.
+"""
+import argparse
+import os
+
+
+def run_node(args):
+    from pydemlia.dht import DHT
+    from pydemlia.network import Network
+    from pydemlia.utils.node import Node
+    from pydemlia.utils.uid import UID
+
+    uid = UID(key=args.id) if args.id else UID(bid=os.urandom(UID.ID_LENGTH))
+    trace = None
+    if args.trace:
+        from pydemlia.utils.trace import TraceWriter
+        trace = TraceWriter(args.trace)
+
+    network = Network(host=args.host, port=args.port, trace=trace)
+    dht = DHT(node=Node(uid, ip=args.host, port=args.port), network=network)
+    print(f"Node {uid} listening on {args.host}:{args.port}")
+
+    if args.bootstrap:
+        host, _, port = args.bootstrap.rpartition(":")
+        # The bootstrap node's ID is not known yet, only its address is used
+        dht.bootstrap(Node(UID(bid=bytes(UID.ID_LENGTH)), ip=host, port=int(port)))
+
+    try:
+        network.receive()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        network.shutdown()
+        if trace is not None:
+            trace.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="pydemlia", description="Kademlia distributed hash table")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    node = commands.add_parser("node", help="Run a DHT node")
+    node.add_argument("--host", default="127.0.0.1", help="Address to bind to")
+    node.add_argument("--port", type=int, default=1337, help="UDP port to bind to")
+    node.add_argument("--id", help="Node ID as 40 hex characters, random by default")
+    node.add_argument("--bootstrap", metavar="HOST:PORT", help="Node to bootstrap from")
+    node.add_argument("--trace", metavar="PATH", help="Capture received datagrams to a trace file")
+    node.set_defaults(func=run_node)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
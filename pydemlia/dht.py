@@ -1,19 +1,56 @@
+import heapq
 import json
+import socket
+import time
+import bencoder
+from threading import Event, Lock
 from typing import Optional
+from pydemlia.network import address_family, decode_value
 from pydemlia.routing.table import RoutingTable
+from pydemlia.rpc.quorum import LatencyTracker, PendingRead, ReadPolicy
+from pydemlia.storage.chunk import CHUNK_SIZE, ChunkAssembler, Manifest, is_manifest, split_value
+from pydemlia.storage.store import LocalStore
+from pydemlia.transport.base import Transport
+from pydemlia.utils.compression import Compressor, available_codecs, decompress, negotiate
+from pydemlia.utils.node import Node
+from pydemlia.utils.uid import UID
+
+REPLICAS = 2  # Closest nodes a value is stored on
+CHUNK_WINDOW = 16  # Chunk requests in flight per value
+CHUNK_REPLICAS = 2  # Nodes holding a copy of each chunk
+CHUNK_RETRY_INTERVAL = 1.0  # Seconds before an unanswered chunk request is sent again to every replica
+CHUNK_TIMEOUT = 30.0
+MAX_VALUE_SIZE = 2 * CHUNK_SIZE  # Largest decompressed value, larger values are chunked and manifests stay below it
+FAMILY_NAMES = {socket.AF_INET: "n4", socket.AF_INET6: "n6"}  # Values of the "want" field of lookups
 
 class DHT:
-    def __init__(self, node, network):
+    def __init__(self, node, network: Transport, read_policy: Optional[ReadPolicy] = None):
         self.node = node
         self.network = network
-        self.routing_table = RoutingTable(self.node.get_uid())
-        self.data_store = {}  # Dictionary to store key-value pairs
+        # One routing table per address family, lookups merge them. The node ID is derived from
+        # the public address of the node's own family, so that table tracks the consensus.
+        self.routing_tables = {
+            family: RoutingTable(self.node.get_uid(), on_restart=self.set_uid if family == self.node.get_family() else None)
+            for family in FAMILY_NAMES
+        }
+        self.routing_table = self.routing_tables[socket.AF_INET]
+        self.data_store = LocalStore()  # Key-value pairs stored locally, keyed by UID
+        self.pending_chunks = {}  # Chunk digest -> [(assembler, progress event)] of the fetches waiting for it
+        self.lock = Lock()
+        self.compressor = Compressor()
+        self.peer_codecs = {}  # Address -> compression codec negotiated through PING/PONG
+        self.read_policy = read_policy or ReadPolicy()
+        self.pending_reads = {}  # Key -> reads waiting for FIND_VALUE replies
+        self.latency = LatencyTracker()
 
         # Register handlers for different operations
         self.network.register_handler("STORE", self.handle_store)
         self.network.register_handler("FIND_VALUE", self.handle_find_value)
         self.network.register_handler("PING", self.handle_ping)
+        self.network.register_handler("PONG", self.handle_pong)
         self.network.register_handler("FIND_NODE", self.handle_find_node)
+        self.network.register_handler("FIND_NODE_RESPONSE", self.handle_find_node_response)
+        self.network.register_handler("FIND_VALUE_RESPONSE", self.handle_find_value_response)
 
     def handle_store(self, message, addr):
         """
@@ -21,11 +58,13 @@ class DHT:
         """
         try:
             key = message['key']
-            value = message['value']
-            self.data_store[key] = value  # Store locally
+            value = self._unpack_value(message)
+            self.data_store[UID(bid=key)] = value  # Store locally
             response = {"operation": "STORE_RESPONSE", "status": "SUCCESS", "key": key}
         except KeyError as e:
             response = {"operation": "STORE_RESPONSE", "status": "FAILURE", "error": f"Missing field: {e}"}
+        except (TypeError, ValueError) as e:
+            response = {"operation": "STORE_RESPONSE", "status": "FAILURE", "error": str(e)}
         self.network.send(response, addr)
 
     def handle_find_value(self, message, addr):
@@ -34,11 +73,13 @@ class DHT:
         """
         try:
             key = message['key']
-            if key in self.data_store:
-                response = {"operation": "FIND_VALUE_RESPONSE", "status": "FOUND", "key": key, "value": self.data_store[key]}
+            uid = UID(bid=key)
+            if uid in self.data_store:
+                response = {"operation": "FIND_VALUE_RESPONSE", "status": "FOUND", "key": key}
+                self._pack_value(response, self.data_store[uid], addr)
             else:
                 # Use routing table to find the closest nodes
-                closest_nodes = self.routing_table.find_closest_nodes(key, 2)
+                closest_nodes = self.find_closest_nodes(uid, 2, self._wanted_families(message, addr))
                 response = {
                     "operation": "FIND_VALUE_RESPONSE",
                     "status": "NOT_FOUND",
@@ -47,22 +88,124 @@ class DHT:
                 }
         except KeyError as e:
             response = {"operation": "FIND_VALUE_RESPONSE", "status": "FAILURE", "error": f"Missing field: {e}"}
+        except (TypeError, ValueError) as e:
+            response = {"operation": "FIND_VALUE_RESPONSE", "status": "FAILURE", "error": f"Invalid key: {e}"}
         self.network.send(response, addr)
 
+    def handle_find_value_response(self, message, addr):
+        """
+        Handler for FIND_VALUE_RESPONSE operation. Completes pending reads and feeds chunks
+        of values being fetched into their assembler.
+        """
+        key = message.get("key")
+        found = message.get("status") == "FOUND"
+        value = None
+        if found:
+            try:
+                value = self._unpack_value(message)
+            except (KeyError, ValueError):
+                found = False  # Counts as a reply without a value
+
+        now = time.monotonic()
+        with self.lock:
+            for read in self.pending_reads.get(key, ()):
+                sent_at = read.sent_at.get(addr)
+                if read.add(addr, found, value):
+                    self.latency.record(now - sent_at)
+
+            if not found or key not in self.pending_chunks:
+                return
+            waiters = self.pending_chunks[key]
+            accepted = [(assembler, progress) for assembler, progress in waiters if assembler.add(key, value)]
+            if not accepted:
+                return  # Corrupted chunk, keep waiting for an intact copy from another replica
+            del self.pending_chunks[key]
+            for assembler, progress in accepted:
+                self._request_chunks(assembler, progress, now)
+        for _, progress in accepted:
+            progress.set()
+
     def handle_ping(self, message, addr):
         """
-        Handler for PING operation. Responds with a PONG message.
+        Handler for PING operation. Responds with a PONG message advertising the supported codecs
+        and the packed address the PING came from.
         """
-        response = {"operation": "PONG"}
+        self.peer_codecs[addr] = negotiate(message.get("codecs", []))
+        response = {"operation": "PONG", "codecs": available_codecs(), "ip": socket.inet_pton(address_family(addr[0]), addr[0])}
         self.network.send(response, addr)
 
+    def handle_pong(self, message, addr):
+        """
+        Handler for PONG operation. Records the compression codec to use with the peer and
+        the address it saw this node at.
+        """
+        self.peer_codecs[addr] = negotiate(message.get("codecs", []))
+        reported = message.get("ip")
+        if isinstance(reported, bytes) and len(reported) in (4, 16):
+            family = socket.AF_INET if len(reported) == 4 else socket.AF_INET6
+            self.update_public_consensus(addr[0], socket.inet_ntop(family, reported))
+
+    def update_public_consensus(self, source, addr):
+        """
+        Records the public address a peer reports for this node. Once a new address of the node's
+        family reaches a majority, the UID is re-derived from it and applied by `set_uid`.
+        """
+        if address_family(addr) == self.node.get_family():
+            self.routing_tables[self.node.get_family()].update_public_consensus(source, addr)
+
+    def set_uid(self, uid):
+        """
+        Moves this node to a new UID and rebuilds every routing table around it.
+        """
+        with self.lock:
+            self.node.id = uid
+        for table in self.routing_tables.values():
+            table.rebuild(uid)
+
+    def _pack_value(self, message, value, addr):
+        """
+        Sets the value of an outgoing message, compressed if a codec was negotiated with the peer.
+        Manifests of chunked values are flagged with the `chunked` field.
+        """
+        if is_manifest(value):
+            message["chunked"] = 1
+            value = dict(value)
+        codec = self.peer_codecs.get(addr)
+        if codec is not None:
+            codec, payload = self.compressor.compress(codec, bencoder.bencode(value))
+        if codec is None:
+            message["value"] = value
+        else:
+            message["value"] = payload
+            message["compression"] = codec
+        return message
+
+    def _unpack_value(self, message):
+        """
+        Gets the value of an incoming message, decompressing it if it carries a compression flag.
+        """
+        value = message['value']
+        codec = message.get("compression")
+        if codec is not None:
+            if not isinstance(value, bytes):
+                raise ValueError("Compressed value is not a string")
+            try:
+                value = decode_value(decompress(codec, value, MAX_VALUE_SIZE))
+            except bencoder.BTFailure as e:
+                raise ValueError(f"Malformed compressed value: {e}")
+        if message.get("chunked"):
+            if not isinstance(value, dict):
+                raise ValueError("Manifest is not a dictionary")
+            return Manifest(value)
+        return value
+
     def handle_find_node(self, message, addr):
         """
         Handler for FIND_NODE operation. Returns the closest nodes to the requested ID.
         """
         try:
             target_id = message['key']
-            closest_nodes = self.routing_table.find_closest_nodes(target_id, 2)
+            closest_nodes = self.find_closest_nodes(UID(bid=target_id), 2, self._wanted_families(message, addr))
             response = {
                 "operation": "FIND_NODE_RESPONSE",
                 "status": "SUCCESS",
@@ -71,36 +214,276 @@ class DHT:
             }
         except KeyError as e:
             response = {"operation": "FIND_NODE_RESPONSE", "status": "FAILURE", "error": f"Missing field: {e}"}
+        except (TypeError, ValueError) as e:
+            response = {"operation": "FIND_NODE_RESPONSE", "status": "FAILURE", "error": f"Invalid key: {e}"}
         self.network.send(response, addr)
 
+    def handle_find_node_response(self, message, addr):
+        """
+        Handler for FIND_NODE_RESPONSE operation. Adds the returned nodes to the routing table of their family.
+        """
+        for compact in message.get("closest_nodes", []):
+            try:
+                self.insert_node(Node.deserialize(compact))
+            except (TypeError, ValueError) as e:
+                print(f"Invalid node info from {addr}: {e}")
+
+    def insert_node(self, node):
+        """
+        Inserts a node into the routing table of its address family.
+        """
+        self.routing_tables[node.get_family()].insert_node(node)
+
+    def find_closest_nodes(self, target_id, n, families=None):
+        """
+        Finds the n closest nodes to the target ID across the routing tables of the given families.
+        :param target_id: UID of the target.
+        :param n: Number of closest nodes to return.
+        :param families: Address families to consider, all by default.
+        """
+        families = self.routing_tables if families is None else families
+        target = target_id.get_int()
+        candidates = (node for family in families for node in self.routing_tables[family].find_closest_nodes(target_id, n))
+        return heapq.nsmallest(n, candidates, key=lambda node: node.get_uid().get_int() ^ target)
+
+    def _wanted_families(self, message, addr):
+        """
+        Address families a lookup asks nodes for, the family it arrived on if it does not say.
+        """
+        want = [name.decode() if isinstance(name, bytes) else name for name in message.get("want", [])]
+        families = [family for family, name in FAMILY_NAMES.items() if name in want]
+        return families or [address_family(addr[0])]
+
+    def _want(self):
+        return [FAMILY_NAMES[family] for family in self.network.get_families() if family in FAMILY_NAMES]
+
     def put(self, key, value):
         """
         Stores a key-value pair in the DHT by sending STORE requests to the closest nodes.
+        Keys are hashed to UIDs, see `UID.from_key`.
+        Values larger than a chunk are stored as content-addressed chunks, with a manifest stored under `key`.
+        Values that are not bytes-like are measured and chunked in their bencoded form.
         """
-        closest_nodes = self.routing_table.find_closest_nodes(key, 2)
+        data = value if isinstance(value, (bytes, bytearray, memoryview)) else bencoder.bencode(value)
+        if len(data) > CHUNK_SIZE:
+            manifest, chunks = split_value(data)
+            if data is not value:
+                manifest["bencoded"] = 1  # Decoded again once fetched
+            for digest, chunk in chunks:
+                self._store(UID(bid=digest), bytes(chunk))
+            value = Manifest(manifest)
+        elif data is value:
+            value = bytes(value)  # bytes is the only bytes-like type bencode accepts
+        self._store(UID.from_key(key), value)
+
+    def _store(self, uid, value):
+        closest_nodes = self.find_closest_nodes(uid, REPLICAS)
         for node in closest_nodes:
-            message = {"operation": "STORE", "key": key, "value": value}
-            self.network.send(message, (node.ip, node.port))
+            self._send_store(uid, value, node)
 
-    def get(self, key):
+    def _send_store(self, uid, value, node):
+        message = {"operation": "STORE", "key": uid.get_bytes()}
+        self._pack_value(message, value, (node.ip, node.port))
+        self.network.send(message, (node.ip, node.port))
+
+    def affected_keys(self, node):
+        """
+        Gets the locally stored keys `node` is a replica of: the keys it is closer to than this
+        node, and for which it is among the REPLICAS closest known nodes. Both node IDs agree above
+        the highest bit they differ at, so the node is closer to exactly the keys that share that
+        bit with it. Only those keys are checked against the routing tables. The result is the
+        same whether or not the node is in the routing tables.
+        """
+        local, remote = self.node.get_uid().get_int(), node.get_uid().get_int()
+        bit = (local ^ remote).bit_length() - 1
+        if bit < 0:
+            return []
+
+        keys = []
+        for uid in self.data_store.with_bit(bit, (remote >> bit) & 1):
+            target = uid.get_int()
+            others = [other for other in self.find_closest_nodes(uid, REPLICAS + 1) if other != node][:REPLICAS]
+            if len(others) < REPLICAS or remote ^ target < others[-1].get_uid().get_int() ^ target:
+                keys.append(uid)
+        return keys
+
+    def handoff(self, node):
+        """
+        Replicates the stored keys a joining neighbor is now closer to onto it.
+        """
+        for uid in self.affected_keys(node):
+            self._send_store(uid, self.data_store[uid], node)
+
+    def rereplicate(self, node):
+        """
+        Republishes the stored keys a departed neighbor was closer to, to the current closest
+        nodes. Remove the node from the routing table first.
+        """
+        for uid in self.affected_keys(node):
+            self._store(uid, self.data_store[uid])
+
+    def get(self, key, policy: Optional[ReadPolicy] = None):
         """
         Retrieves a value from the DHT by sending FIND_VALUE requests to the closest nodes.
+        Returns as soon as the policy's quorum of values has arrived. Nodes that are slower than
+        the policy's latency percentile get hedged by querying the next closest node, and
+        replies arriving after the result is known are dropped.
+        A copy held by this node counts as one of the values.
+        :param key: The key to look up, hashed to a UID like in `put`.
+        :param policy: ReadPolicy to apply, defaults to `self.read_policy`.
+        :return: The value most nodes agreed on, or None if no node had one.
+        """
+        policy = policy or self.read_policy
+        uid = UID.from_key(key)
+        closest_nodes = self.find_closest_nodes(uid, policy.replicas + policy.hedges)
+        primary, spare = closest_nodes[:policy.replicas], closest_nodes[policy.replicas:]
+
+        read = PendingRead(policy.quorum, len(primary))
+        if uid in self.data_store:
+            read.values.append(self.data_store[uid])
+        if primary and len(read.values) < policy.quorum:
+            self._query_value(read, uid.get_bytes(), primary, spare, policy)
+
+        with self.lock:
+            value = read.result()
+        if is_manifest(value):
+            data = self.fetch_chunks(value)
+            return decode_value(data) if value.get("bencoded") else data
+        return value
+
+    def _query_value(self, read, wire_key, primary, spare, policy):
+        """
+        Sends FIND_VALUE requests and waits until the read is complete, hedging late nodes with spare ones.
+        """
+        with self.lock:
+            self.pending_reads.setdefault(wire_key, []).append(read)
+
+        try:
+            for node in primary:
+                self._send_find_value(read, wire_key, node)
+
+            deadline = time.monotonic() + policy.timeout
+            hedge_at = time.monotonic() + self.latency.hedge_delay(policy.hedge_percentile)
+            while True:
+                now = time.monotonic()
+                wait_until = min(deadline, hedge_at) if spare else deadline
+                if read.done.wait(max(0.0, wait_until - now)):
+                    with self.lock:
+                        if len(read.values) >= policy.quorum or not spare:
+                            break
+                        read.done.clear()  # Every queried node replied but the quorum is not met yet
+                    hedge_at = now
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                if spare and now >= hedge_at:
+                    self._send_find_value(read, wire_key, spare.pop(0), extra=True)
+                    hedge_at = now + self.latency.hedge_delay(policy.hedge_percentile)
+        finally:
+            # Cancel outstanding queries, late replies find no pending read and are dropped
+            with self.lock:
+                reads = self.pending_reads.get(wire_key, [])
+                reads.remove(read)
+                if not reads:
+                    self.pending_reads.pop(wire_key, None)
+
+    def _send_find_value(self, read, key, node, extra=False):
+        with self.lock:
+            read.sent((node.ip, node.port), time.monotonic(), extra)
+        message = {"operation": "FIND_VALUE", "key": key, "want": self._want()}
+        self.network.send(message, (node.ip, node.port))
+
+    def fetch_chunks(self, manifest, sink=None, timeout=CHUNK_TIMEOUT):
+        """
+        Fetches the chunks of a large value in parallel from the closest nodes and assembles them.
+        :param manifest: The manifest stored under the value's key.
+        :param sink: Optional writable file-like object the value is streamed into.
+        :param timeout: Seconds to wait for the whole value.
+        :return: The value as bytes, or `sink` when one is given.
+        """
+        deadline = time.monotonic() + timeout
+        if "index" in manifest:
+            index = self.fetch_chunks(manifest["index"], timeout=timeout)
+            manifest = dict(manifest, chunks=index)
+
+        assembler = ChunkAssembler(manifest, sink)
+        progress = Event()
+        with self.lock:
+            self._request_chunks(assembler, progress, time.monotonic())
+
+        while True:
+            progress.clear()
+            with self.lock:
+                if assembler.done():
+                    return assembler.result()
+                now = time.monotonic()
+                if now >= deadline:
+                    missing = len(assembler.missing())
+                    self._unregister_chunks(assembler)
+                    raise TimeoutError(f"Timed out fetching value, {missing} chunks missing")
+
+                # The request or its response may have been dropped, ask every replica
+                for digest in assembler.overdue(now, CHUNK_RETRY_INTERVAL):
+                    self._register_chunk(digest, assembler, progress)
+                    self._request_chunk(digest, retry=True)
+                wake_at = min(assembler.next_timeout(CHUNK_RETRY_INTERVAL) or deadline, deadline)
+            progress.wait(max(0.0, wake_at - now))
+
+    def _request_chunks(self, assembler, progress, now):
+        """
+        Requests the chunks of the window after the assembler's cursor that are not in flight yet.
+        Chunks this node holds itself are taken from the local store.
+        """
+        while True:
+            local = []
+            for digest in assembler.next_requests(CHUNK_WINDOW, now):
+                chunk = self.data_store.get(UID(bid=digest))
+                if chunk is not None:
+                    local.append((digest, chunk))
+                else:
+                    self._register_chunk(digest, assembler, progress)
+                    self._request_chunk(digest)
+            if not local:
+                return
+            # Moving the cursor opens the window further
+            for digest, chunk in local:
+                assembler.add(digest, chunk)
+
+    def _register_chunk(self, digest, assembler, progress):
+        waiters = self.pending_chunks.setdefault(digest, [])
+        if not any(waiter is assembler for waiter, _ in waiters):
+            waiters.append((assembler, progress))
+
+    def _unregister_chunks(self, assembler):
+        for digest in assembler.missing():
+            waiters = [waiter for waiter in self.pending_chunks.get(digest, []) if waiter[0] is not assembler]
+            if waiters:
+                self.pending_chunks[digest] = waiters
+            else:
+                self.pending_chunks.pop(digest, None)
+
+    def _request_chunk(self, digest, retry=False):
+        """
+        Sends a FIND_VALUE request for a chunk. The first request goes to a single replica, picked
+        by digest to spread the load, retries go to all of them.
         """
-        closest_nodes = self.routing_table.find_closest_nodes(key, 2)
+        closest_nodes = self.find_closest_nodes(UID(bid=digest), CHUNK_REPLICAS)
+        if closest_nodes and not retry:
+            closest_nodes = [closest_nodes[digest[0] % len(closest_nodes)]]
         for node in closest_nodes:
-            message = {"operation": "FIND_VALUE", "key": key}
+            message = {"operation": "FIND_VALUE", "key": digest}
             self.network.send(message, (node.ip, node.port))
 
     def ping(self, target_node):
         """
         Sends a PING request to a specific node.
         """
-        message = {"operation": "PING"}
+        message = {"operation": "PING", "codecs": available_codecs()}
         self.network.send(message, (target_node.ip, target_node.port))
 
     def bootstrap(self, bootstrap_node):
         """
         Bootstraps the DHT by finding the closest nodes to itself via a bootstrap node.
         """
-        message = {"operation": "FIND_NODE", "key": self.get_uid()}
+        message = {"operation": "FIND_NODE", "key": self.node.get_uid().get_bytes(), "want": self._want()}
         self.network.send(message, (bootstrap_node.ip, bootstrap_node.port))
@@ -1,51 +1,144 @@
+import selectors
 import socket
 import threading
 import bencoder
-import json
+from pydemlia.transport.base import Transport, address_family
+
+MAX_DATAGRAM_SIZE = 65507  # Largest UDP payload, larger values are chunked by the DHT
+TEXT_FIELDS = ("operation", "status", "error", "compression")
+
+
+def decode_message(data: bytes) -> dict:
+    """
+    Decode a bencoded message. Dictionary keys and the text fields are returned as `str`,
+    every other string is left as `bytes`.
+    """
+    parsed_message, length = bencoder.bdecode2(data)
+    if not isinstance(parsed_message, dict):
+        raise ValueError("Message is not a dictionary")
+    message = _decode_keys(parsed_message)
+    for field in TEXT_FIELDS:
+        if isinstance(message.get(field), bytes):
+            message[field] = message[field].decode()
+    return message
+
+
+def decode_value(data: bytes):
+    """
+    Decode a bencoded value, dictionary keys are returned as `str`.
+    """
+    value, length = bencoder.bdecode2(data)
+    return _decode_keys(value)
+
+
+def _decode_keys(obj):
+    if isinstance(obj, dict):
+        return {(k.decode() if isinstance(k, bytes) else k): _decode_keys(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_decode_keys(v) for v in obj]
+    return obj
+
+
+class Network(Transport):
+    def __init__(self, host, port, trace=None, host6=None):
+        """
+        UDP transport, messages are bencoded and each received datagram is handled on its own thread.
+        :param host: IPv4 or IPv6 address to bind to.
+        :param port: Port to bind to.
+        :param trace: Optional TraceWriter capturing every received datagram.
+        :param host6: Optional IPv6 address to bind a second socket to on the same port, for dual-stack nodes.
+        """
+        super().__init__()
+        self.sockets = {}  # Address family -> socket
+        self.socket = self._bind(host, port)  # Primary socket
+        if host6 is not None:
+            if address_family(host6) != socket.AF_INET6 or socket.AF_INET6 in self.sockets:
+                raise ValueError(f"{host6} cannot be used as the IPv6 address of a dual-stack node bound to {host}")
+            self._bind(host6, self.socket.getsockname()[1])
+
+        # Both sockets are served by a single receive loop
+        self.selector = selectors.DefaultSelector()
+        for sock in self.sockets.values():
+            self.selector.register(sock, selectors.EVENT_READ)
 
-class Network:
-    def __init__(self, host, port):
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.bind((host, port))
-        self.socket.settimeout(1)  # Allow graceful shutdown
         self.running = True
-        self.handlers = {}  # Map operations to handler methods
+        self.trace = trace
+
+    def _bind(self, host, port):
+        family = address_family(host)
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        if family == socket.AF_INET6:
+            sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)  # IPv4 is served by its own socket
+        sock.bind((host, port))
+        self.sockets[family] = sock
+        return sock
+
+    def get_families(self):
+        """Address families this network can reach."""
+        return list(self.sockets)
 
     def send(self, message, address):
         try:
+            sock = self.sockets.get(address_family(address[0]))
+            if sock is None:
+                raise ValueError("No socket bound for the address family")
             serialized_message = bencoder.bencode(message)
             print(f"Send '{serialized_message}' to {address}")
-            self.socket.sendto(serialized_message, address)
+            sock.sendto(serialized_message, address)
         except Exception as e:
             print(f"Error sending message to {address}: {e}")
 
     def receive(self):
         while self.running:
             try:
-                data, addr = self.socket.recvfrom(1024)
-                message = data.decode()
-                print(f"Received {message} from {addr}")
-                threading.Thread(target=self.handle_message, args=(message, addr)).start()
-            except socket.timeout:
-                continue
-            except Exception as e:
-                print(f"Error receiving message: {e}")
-
-    def handle_message(self, message, addr):
+                events = self.selector.select(timeout=1)  # Allow graceful shutdown
+            except (OSError, ValueError):
+                continue  # Selector closed by shutdown
+            for key, _ in events:
+                try:
+                    data, addr = key.fileobj.recvfrom(MAX_DATAGRAM_SIZE)
+                    addr = addr[:2]  # Drop the IPv6 flow info and scope ID
+                    if self.trace is not None:
+                        self.trace.write(data, addr)
+                    print(f"Received {len(data)} bytes from {addr}")
+                    threading.Thread(target=self.handle_message, args=(data, addr)).start()
+                except Exception as e:
+                    print(f"Error receiving message: {e}")
+
+    def handle_message(self, data, addr):
         try:
-            parsed_message, length = bencoder.bdecode2(message)
-            operation = parsed_message.get('operation')
-            if operation in self.handlers:
-                self.handlers[operation](parsed_message, addr)
-            else:
-                print(f"Unknown operation: {operation}")
-        except json.JSONDecodeError as e:
+            parsed_message = decode_message(data)
+        except (bencoder.BTFailure, ValueError, TypeError) as e:
             print(f"Failed to decode message from {addr}: {e}")
-
-    def register_handler(self, operation, handler):
-        """Register a handler for a specific operation."""
-        self.handlers[operation] = handler
+            return
+        self.dispatch(parsed_message, addr)
 
     def shutdown(self):
         self.running = False
-        self.socket.close()
+        self.selector.close()
+        for sock in self.sockets.values():
+            sock.close()
+
+
+class ReplayNetwork(Network):
+    """
+    Network without a socket, for replaying traces offline. Outgoing messages are
+    still encoded, so their cost shows up in profiles, but are dropped afterwards.
+    """
+
+    def __init__(self):
+        Transport.__init__(self)
+        self.sockets = {}
+        self.running = False
+        self.trace = None
+        self.sent = 0
+
+    def send(self, message, address):
+        bencoder.bencode(message)
+        self.sent += 1
+
+    def receive(self):
+        pass
+
+    def shutdown(self):
+        pass
@@ -9,35 +9,52 @@ class KBucket:
     def __init__(self):
         self.nodes: List[Node] = []  # List of active nodes
         self.cache: List[Node] = []  # List of cached nodes
+        self.untrusted: List[Node] = []  # Active nodes failing the secure ID check, oldest first
         self.lock = Lock()
 
-    def insert(self, node: Node):
+    def insert(self, node: Node, trusted: bool = True):
+        """
+        Insert or refresh a node. Untrusted nodes only take free active slots, a trusted node
+        arriving at a full bucket moves one of them to the cache.
+        """
         with self.lock:
             if node in self.nodes:
                 # Update existing node
                 existing_node = self.nodes[self.nodes.index(node)]
                 existing_node.set_seen()
                 self.nodes.sort()
-            elif len(self.nodes) >= KBucket.MAX_BUCKET_SIZE:
-                # Bucket is full
-                if node in self.cache:
-                    # Update existing node in cache
-                    existing_node = self.cache[self.cache.index(node)]
-                    existing_node.set_seen()
-                elif len(self.cache) >= KBucket.MAX_BUCKET_SIZE:
-                    # Cache is also full, remove a stale node
-                    stale = max((n for n in self.cache if n.get_stale() >= KBucket.MAX_STALE_COUNT), 
-                                key=lambda n: n.get_stale(), default=None)
-                    if stale:
-                        self.cache.remove(stale)
-                        self.cache.append(node)
-                else:
-                    # Add new node to cache
-                    self.cache.append(node)
-            else:
+            elif len(self.nodes) < KBucket.MAX_BUCKET_SIZE:
                 # Add new node to active list
                 self.nodes.append(node)
                 self.nodes.sort()
+                if not trusted:
+                    self.untrusted.append(node)
+            elif trusted and self.untrusted:
+                # Bucket is full, the trusted node takes the slot of an untrusted one
+                demoted = self.untrusted.pop(0)
+                self.nodes.remove(demoted)
+                self.nodes.append(node)
+                self.nodes.sort()
+                self._cache(demoted)
+            else:
+                # Bucket is full
+                self._cache(node)
+
+    def _cache(self, node: Node):
+        if node in self.cache:
+            # Update existing node in cache
+            existing_node = self.cache[self.cache.index(node)]
+            existing_node.set_seen()
+        elif len(self.cache) >= KBucket.MAX_BUCKET_SIZE:
+            # Cache is also full, remove a stale node
+            stale = max((n for n in self.cache if n.get_stale() >= KBucket.MAX_STALE_COUNT), 
+                        key=lambda n: n.get_stale(), default=None)
+            if stale:
+                self.cache.remove(stale)
+                self.cache.append(node)
+        else:
+            # Add new node to cache
+            self.cache.append(node)
 
     def remove(self, node: Node):
         """
@@ -46,12 +63,11 @@ class KBucket:
         with self.lock:
             if node in self.nodes:
                 self.nodes.remove(node)
+            if node in self.untrusted:
+                self.untrusted.remove(node)
             if node in self.cache:
                 self.cache.remove(node)
 
-    def derive_uid(self, node):
-        pass
-    
     def contains_ip(self, node: Node) -> bool:
         with self.lock:
             return node in self.nodes or node in self.cache
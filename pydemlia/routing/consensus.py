@@ -0,0 +1,57 @@
+from collections import OrderedDict
+from typing import Optional
+
+
+class VoteTracker:
+    MIN_VOTES = 20  # Votes needed before a consensus is reported
+
+    def __init__(self, window: int = 64, min_votes: int = MIN_VOTES):
+        """
+        Track which public address other nodes report for us.
+        Each source holds a single vote and only the `window` most recent votes count,
+        every update is O(1).
+        :param window: Maximum number of votes kept.
+        :param min_votes: Votes needed before a consensus is reported.
+        """
+        self.window = window
+        self.min_votes = min_votes
+        self.votes = OrderedDict()  # Source -> address, oldest vote first
+        self.counts = {}  # Address -> number of votes
+
+    def vote(self, source: str, addr: str) -> Optional[str]:
+        """
+        Record the address reported by a source, replacing its previous vote.
+        The number of votes never shrinks, so once `min_votes` is reached a new majority can
+        only be reached by the address just voted for and checking it alone is enough. When
+        the count reaches `min_votes`, the leading address is checked instead.
+        :return: The address that now holds a strict majority, None if there is none.
+        """
+        if source in self.votes:
+            self._remove(self.votes.pop(source))
+        elif len(self.votes) >= self.window:
+            _, oldest = self.votes.popitem(last=False)
+            self._remove(oldest)
+
+        self.votes[source] = addr
+        count = self.counts[addr] = self.counts.get(addr, 0) + 1
+
+        if len(self.votes) < self.min_votes:
+            return None
+        if len(self.votes) == self.min_votes:
+            addr, count = max(self.counts.items(), key=lambda item: item[1])
+        if count * 2 > len(self.votes):
+            return addr
+        return None
+
+    def _remove(self, addr: str):
+        count = self.counts[addr] - 1
+        if count:
+            self.counts[addr] = count
+        else:
+            del self.counts[addr]
+
+    def count(self, addr: str) -> int:
+        return self.counts.get(addr, 0)
+
+    def __len__(self) -> int:
+        return len(self.votes)
@@ -1,46 +1,114 @@
-import random
-import struct
-import zlib # for CRC32
+import heapq
+from functools import lru_cache
 from pydemlia.utils.uid import UID
-from threading import Lock
-from typing import List
+from threading import Lock, Thread
+from typing import Callable, List, Optional
 from pydemlia.utils.node import Node
-from pydemlia.utils.collections import TreeSet, LimitedOrderedDict
+from pydemlia.utils.collections import LazyList
 from pydemlia.routing.bucket import KBucket
+from pydemlia.routing.consensus import VoteTracker
 
 
 V4_MASK = [0xFF, 0xFF, 0x00, 0x00]
 V6_MASK = [0xFF, 0xFF, 0xFF, 0xFF, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00]
 
+SECURE_REJECT = "reject"  # Nodes with an ID not derived from their IP are not inserted
+SECURE_DOWNRANK = "downrank"  # Such nodes only take free bucket slots and give way to trusted nodes
+
+
+@lru_cache(maxsize=4096)
+def _mask_ip(ip: str):
+    """
+    Get the masked IP prefix node IDs are derived from, and whether the address is exempt
+    from verification because it is not globally routable.
+    """
+    import ipaddress
+    import socket
+
+    ip_bytes = socket.inet_pton(socket.AF_INET6 if ":" in ip else socket.AF_INET, ip)
+    mask = V6_MASK if len(ip_bytes) == 16 else V4_MASK
+    ip_masked = bytes(ip_byte & mask_byte for ip_byte, mask_byte in zip(ip_bytes, mask))
+    return ip_masked, not ipaddress.ip_address(ip_bytes).is_global
+
+
+def _id_prefix(ip_masked: bytes, rand: int) -> int:
+    """
+    CRC32 of the masked IP with the 3 random bits of the ID mixed into the first byte.
+    """
+    import zlib  # for CRC32
+
+    ip_masked = bytearray(ip_masked)
+    ip_masked[0] |= (rand & 0x7) << 5
+    return zlib.crc32(ip_masked)
+
+
+@lru_cache(maxsize=65536)
+def _verify_prefix(ip_masked: bytes, rand: int, prefix: bytes) -> bool:
+    crc = _id_prefix(ip_masked, rand)
+    return prefix[0] == (crc >> 24) & 0xFF and prefix[1] == (crc >> 16) & 0xFF and prefix[2] & 0xF8 == (crc >> 8) & 0xF8
+
+
+def verify_uid(uid: UID, ip: str) -> bool:
+    """
+    Check that a node ID was derived from the node's IP, as done by `RoutingTable.derive_uid`.
+    Addresses that are not globally routable are always accepted. Results are cached per
+    (IP prefix, ID prefix), so repeated checks cost two dictionary lookups.
+    """
+    try:
+        ip_masked, exempt = _mask_ip(ip)
+    except (OSError, ValueError):
+        return False
+    if exempt:
+        return True
+    bid = uid.get_bytes()
+    return _verify_prefix(ip_masked, bid[19] & 0x7, bid[:3])
+
+
 class RoutingTable:
-    def __init__(self, local_id: UID, bucket_size: int = KBucket.MAX_BUCKET_SIZE):
+    def __init__(self, local_id: UID, bucket_size: int = KBucket.MAX_BUCKET_SIZE, secure_ids: str = SECURE_DOWNRANK,
+                 on_restart: Optional[Callable[[UID], None]] = None):
         """
         Initialize the Routing Table.
         :param local_id: UID of the local node.
         :param bucket_size: Maximum size of each KBucket.
+        :param secure_ids: How nodes whose ID does not match their IP are treated,
+                           SECURE_REJECT, SECURE_DOWNRANK or None to accept them.
+        :param on_restart: Called with the UID re-derived after a consensus change, instead of
+                           rebuilding this table alone. Owners of the node ID apply it everywhere.
         """
         self.local_id = local_id
         self.bucket_size = bucket_size
-        self.kbuckets = [KBucket() for _ in range(local_id.ID_LENGTH * 8)]  # One KBucket per prefix length
+        self.secure_ids = secure_ids
+        self.on_restart = on_restart
+        self.kbuckets = LazyList(local_id.ID_LENGTH * 8, KBucket)  # One KBucket per prefix length, created on first use
         self.lock = Lock()
         
         self.consensus_ip = str()
-        self.origin_pairs = LimitedOrderedDict(64)
+        self.origin_pairs = VoteTracker(64)  # Public address reported by each source
+        self.restart_pending = False
+        self.restart_thread = None
 
     def _get_bucket_index(self, node_id: UID) -> int:
         """
         Determine the index of the KBucket for a given node ID based on XOR distance.
         """
-        distance = self.local_id.get_distance(node_id)
-        return distance
+        distance = self.local_id.get_distance(node_id)  # 1 - 160, 0 for the local ID itself
+        return max(distance - 1, 0)
 
-    def insert_node(self, node: Node):
+    def insert_node(self, node: Node) -> bool:
         """
-        Insert a node into the appropriate KBucket.
+        Insert a node into the appropriate KBucket. Nodes failing the secure ID check are
+        rejected or downranked, depending on `secure_ids`.
+        :return: False if the node was rejected.
         """
+        trusted = self.secure_ids is None or verify_uid(node.get_uid(), node.get_ip())
+        if not trusted and self.secure_ids == SECURE_REJECT:
+            return False
+
         with self.lock:
             bucket_index = self._get_bucket_index(node.get_uid())
-            self.kbuckets[bucket_index].insert(node)
+            self.kbuckets[bucket_index].insert(node, trusted)
+        return True
 
     def find_closest_nodes(self, target_id: UID, n: int) -> List[Node]:
         """
@@ -50,17 +118,9 @@ class RoutingTable:
         :return: List of Node objects closest to the target.
         """
         with self.lock:
-            tree_set = TreeSet(key=lambda _node: k.get_distance(_node.id))
-            for bucket in self.kbuckets:
-                tree_set.add_all(bucket.get_all_nodes())
-
-            closest = []
-            for count, node in enumerate(tree_set):
-                closest.append(node)
-                if count == n:
-                    break
-
-            return closest
+            target = target_id.get_int()
+            nodes = (node for bucket in self.kbuckets.allocated() for node in bucket.get_all_nodes())
+            return heapq.nsmallest(n, nodes, key=lambda node: node.get_uid().get_int() ^ target)
 
 
     def remove_node(self, node: Node):
@@ -77,7 +137,7 @@ class RoutingTable:
         """
         with self.lock:
             all_nodes = []
-            for bucket in self.kbuckets:
+            for bucket in self.kbuckets.allocated():
                 all_nodes.extend(bucket.get_all_nodes())
             return all_nodes
 
@@ -87,49 +147,52 @@ class RoutingTable:
         """
         with self.lock:
             unqueried_nodes = []
-            for bucket in self.kbuckets:
+            for bucket in self.kbuckets.allocated():
                 unqueried_nodes.extend(bucket.get_unqueried_nodes(now))
             return unqueried_nodes
 
     def update_public_consensus(self, source: str, addr: str):
-        # if addr is not global_unicast:
-        #     return
-        with self.lock:
-            self.origin_pairs[source] = addr
-
-            if len(self.origin_pairs) > 20 and addr != self.consensus_ip:
-                k = self.origin_pairs.values()
-                res = 0
-                count = 1
-
-                for i in range(len(k)):
-                    count =+ 1 if k[i] == k[res] else -1
-                    if count == 0:
-                        res = i
-                        count = 1
+        """
+        Record the public address a source reports for us. When a new address reaches a
+        majority, the UID is re-derived and the table rebuilt on a background thread.
+        Addresses that are not globally routable are ignored, IDs are not verified against them.
+        """
+        try:
+            _, exempt = _mask_ip(addr)
+        except (OSError, ValueError):
+            return
+        if exempt:
+            return
 
-                if self.consensus_ip != k[res]:
-                    self.consensus_ip = k[res]
-                    self.restart()
+        with self.lock:
+            consensus = self.origin_pairs.vote(source, addr)
+            if consensus is None or consensus == self.consensus_ip:
+                return
+            self.consensus_ip = consensus
+            if self.restart_pending:
+                return  # The queued restart picks up the latest consensus
+            self.restart_pending = True
+            self.restart_thread = Thread(target=self._restart_worker, daemon=True)
+        self.restart_thread.start()
+
+    def _restart_worker(self):
+        with self.lock:
+            self.restart_pending = False
+        self.restart()
 
     def derive_uid(self):
         """
         Derive a unique identifier (UID) for the routing table based on the consensus IP.
         """
-        # Convert the IP to bytes and determine its mask
-        ip = self.consensus_ip.split(":") if ":" in self.consensus_ip else self.consensus_ip.split(".")
-        ip_bytes = bytearray(int(part, 16 if ":" in self.consensus_ip else 10) for part in ip)
-        mask = bytearray(V6_MASK if len(ip_bytes) == 16 else V4_MASK)
+        import random
 
-        # Apply the mask to the IP
-        ip_masked = bytearray(ip_byte & mask_byte for ip_byte, mask_byte in zip(ip_bytes, mask))
+        with self.lock:
+            consensus_ip = self.consensus_ip
 
-        # Generate a random number and modify the first byte of the masked IP
+        # Mask the IP and mix 3 random bits into it before calculating its CRC32
+        ip_masked, _ = _mask_ip(consensus_ip)
         rand = random.randint(0, 255)
-        ip_masked[0] |= (rand & 0x7) << 5
-
-        # Calculate CRC32 for the masked IP
-        crc = zlib.crc32(ip_masked)
+        crc = _id_prefix(ip_masked, rand)
 
         # Build the UID's `bid`
         bid = bytearray(20)
@@ -141,7 +204,26 @@ class RoutingTable:
         bid[19] = rand & 0xFF
 
         # Set the derived UID
-        self.uid = UID(bytes(bid))
+        self.uid = UID(bid=bytes(bid))
 
     def restart(self):
-        self.derive_uid()
\ No newline at end of file
+        """
+        Re-derive the UID from the consensus IP and rebuild the buckets around it, or hand it
+        to `on_restart` if set.
+        """
+        self.derive_uid()
+        if self.on_restart is not None:
+            self.on_restart(self.uid)
+        else:
+            self.rebuild(self.uid)
+
+    def rebuild(self, local_id: UID):
+        """
+        Move the table to a new local ID, keeping the known nodes.
+        """
+        with self.lock:
+            nodes = [node for bucket in self.kbuckets.allocated() for node in bucket.get_all_nodes()]
+            self.local_id = local_id
+            self.kbuckets = LazyList(self.local_id.ID_LENGTH * 8, KBucket)
+            for node in nodes:
+                self.kbuckets[self._get_bucket_index(node.get_uid())].insert(node)
@@ -0,0 +1,103 @@
+from collections import deque
+from threading import Event, Lock
+from typing import Optional
+import bencoder
+
+
+class ReadPolicy:
+    def __init__(self, replicas: int = 2, quorum: int = 1, hedges: int = 2, hedge_percentile: float = 0.95,
+                 timeout: float = 5.0):
+        """
+        How many replies a read waits for.
+        :param replicas: Number of closest nodes queried up front (N).
+        :param quorum: Number of valid values to wait for (R), 1 returns on the first value.
+        :param hedges: Maximum number of extra nodes queried when replies are late.
+        :param hedge_percentile: Reply latency percentile after which a hedged request is sent.
+        :param timeout: Seconds to wait before returning whatever has arrived.
+        """
+        if quorum < 1 or quorum > replicas + hedges:
+            raise ValueError(f"Quorum must be between 1 and {replicas + hedges}")
+        self.replicas = replicas
+        self.quorum = quorum
+        self.hedges = hedges
+        self.hedge_percentile = hedge_percentile
+        self.timeout = timeout
+
+
+class LatencyTracker:
+    DEFAULT_DELAY = 0.5  # Seconds to wait before hedging when nothing was measured yet
+    MIN_DELAY = 0.01
+
+    def __init__(self, window: int = 256):
+        """
+        Sliding window of reply latencies.
+        :param window: Number of recent samples to keep.
+        """
+        self.samples = deque(maxlen=window)
+        self.lock = Lock()
+
+    def record(self, latency: float):
+        with self.lock:
+            self.samples.append(latency)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        Get the p-th percentile (0.0 - 1.0) of the recorded latencies, None without samples.
+        """
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+    def hedge_delay(self, p: float) -> float:
+        latency = self.percentile(p)
+        return LatencyTracker.DEFAULT_DELAY if latency is None else max(LatencyTracker.MIN_DELAY, latency)
+
+
+class PendingRead:
+    def __init__(self, quorum: int, expected: int):
+        """
+        State of a read waiting for its replies.
+        :param quorum: Number of valid values needed.
+        :param expected: Number of nodes queried so far.
+        """
+        self.quorum = quorum
+        self.expected = expected
+        self.sent_at = {}  # Address -> time the request was sent
+        self.replied = set()
+        self.values = []
+        self.done = Event()
+
+    def sent(self, addr, now: float, extra: bool = False):
+        """Record a request, `extra` marks a request to a node not counted in `expected` yet."""
+        self.sent_at.setdefault(addr, now)
+        if extra:
+            self.expected += 1
+
+    def add(self, addr, found: bool, value=None) -> bool:
+        """
+        Add a reply. Duplicate replies from the same node are ignored.
+        :return: True if the reply was accepted.
+        """
+        if addr in self.replied or addr not in self.sent_at:
+            return False
+        self.replied.add(addr)
+        if found:
+            self.values.append(value)
+        if len(self.values) >= self.quorum or len(self.replied) >= self.expected:
+            self.done.set()
+        return True
+
+    def result(self):
+        """
+        Get the value returned by most nodes, None if no node had one.
+        """
+        if not self.values:
+            return None
+        votes = {}
+        for value in self.values:
+            encoded = (type(value), bencoder.bencode(value))  # Manifests only match manifests
+            count, _ = votes.get(encoded, (0, value))
+            votes[encoded] = (count + 1, value)
+        return max(votes.values(), key=lambda vote: vote[0])[1]
@@ -0,0 +1,154 @@
+import hashlib
+import io
+from typing import Dict, Iterator, List, Optional, Tuple
+
+CHUNK_SIZE = 1024  # Bytes of value data per chunk, keeps a STORE well below the MTU
+DIGEST_SIZE = 20  # SHA1, same width as a UID
+
+
+def chunk_digest(data) -> bytes:
+    """Content address of a chunk."""
+    return hashlib.sha1(data).digest()
+
+
+def split_value(data, chunk_size: int = CHUNK_SIZE) -> Tuple[dict, List[Tuple[bytes, memoryview]]]:
+    """
+    Split a value into content-addressed chunks.
+    :param data: The value as a bytes-like object.
+    :param chunk_size: Maximum size of a single chunk.
+    :return: The manifest describing the value and a list of (digest, chunk) pairs.
+             Chunks are memoryviews over `data`, so no copies are made here.
+    """
+    view = memoryview(data).cast("B")
+    chunks = []
+    for offset in range(0, len(view), chunk_size):
+        chunk = view[offset:offset + chunk_size]
+        chunks.append((chunk_digest(chunk), chunk))
+
+    manifest = {"size": len(view), "digest": chunk_digest(view)}
+    index = b"".join(digest for digest, _ in chunks)
+    if len(index) > chunk_size:
+        # The digest list would not fit into a single datagram, store it as a value of its own
+        manifest["index"], index_chunks = split_value(index, chunk_size)
+        chunks.extend(index_chunks)
+    else:
+        manifest["chunks"] = index
+    return manifest, chunks
+
+
+class Manifest(dict):
+    """
+    Manifest of a chunked value, as built by `split_value`. Its own type keeps user values that
+    happen to look like a manifest apart from real ones. On the wire it is marked by the
+    `chunked` field of the message carrying it.
+    """
+
+
+def is_manifest(value) -> bool:
+    return isinstance(value, Manifest)
+
+
+class ChunkAssembler:
+    def __init__(self, manifest: dict, sink=None):
+        """
+        Reassemble a value from chunks arriving in any order.
+        :param manifest: Manifest as built by `split_value`, with a flat `chunks` digest list.
+        :param sink: Writable file-like object the value is streamed into. Defaults to an in-memory buffer.
+        """
+        index = manifest["chunks"]
+        if len(index) % DIGEST_SIZE != 0:
+            raise ValueError("Malformed manifest, chunk index is not a multiple of the digest size")
+
+        self.size = manifest["size"]
+        self.digest = manifest["digest"]
+        self.in_memory = sink is None
+        self.sink = io.BytesIO() if self.in_memory else sink
+
+        self.digests: List[bytes] = []  # Digest of each position in the value
+        self.positions: Dict[bytes, List[int]] = {}  # digest -> positions in the value, until it arrives
+        for position in range(len(index) // DIGEST_SIZE):
+            digest = bytes(index[position * DIGEST_SIZE:(position + 1) * DIGEST_SIZE])
+            self.digests.append(digest)
+            self.positions.setdefault(digest, []).append(position)
+        self.count = len(self.digests)
+
+        self.requested: Dict[bytes, float] = {}  # Digests in flight -> time of their last request
+        self.pending: Dict[int, bytes] = {}  # Out-of-order chunks waiting for their turn
+        self.cursor = 0  # Next position to write to the sink
+        self.written = 0
+        self.hasher = hashlib.sha1()
+
+    def next_requests(self, window: int, now: float = 0.0) -> Iterator[bytes]:
+        """
+        Yield the digests of the next `window` positions after the cursor that have not been
+        requested yet. Requests never run further ahead of the cursor, so at most `window`
+        chunks are buffered while an earlier one is missing.
+        :param window: Number of positions after the cursor that may be in flight.
+        :param now: Time of the request, for `overdue`.
+        """
+        for position in range(self.cursor, min(self.cursor + window, self.count)):
+            digest = self.digests[position]
+            if digest in self.positions and digest not in self.requested:
+                self.requested[digest] = now
+                yield digest
+
+    def overdue(self, now: float, timeout: float) -> List[bytes]:
+        """
+        Get the digests whose last request is at least `timeout` old, and restart their timer.
+        """
+        digests = [digest for digest, sent_at in self.requested.items() if now - sent_at >= timeout]
+        for digest in digests:
+            self.requested[digest] = now
+        return digests
+
+    def next_timeout(self, timeout: float) -> Optional[float]:
+        """
+        Get the time at which the oldest request in flight becomes overdue, None if there is none.
+        """
+        return min(self.requested.values()) + timeout if self.requested else None
+
+    def missing(self) -> List[bytes]:
+        """
+        Get the digests which were requested but have not arrived.
+        """
+        return list(self.requested)
+
+    def add(self, digest: bytes, data: bytes) -> bool:
+        """
+        Add a chunk. Chunks that are unknown or fail the integrity check are ignored.
+        :return: True if the chunk was accepted.
+        """
+        positions = self.positions.get(digest)
+        if positions is None or not isinstance(data, bytes) or chunk_digest(data) != digest:
+            return False
+
+        del self.positions[digest]
+        self.requested.pop(digest, None)
+        for position in positions:
+            self.pending[position] = data
+        self._flush()
+        return True
+
+    def _flush(self):
+        while self.cursor in self.pending:
+            data = self.pending.pop(self.cursor)
+            self.sink.write(data)
+            self.hasher.update(data)
+            self.written += len(data)
+            self.cursor += 1
+
+    def done(self) -> bool:
+        return self.cursor == self.count
+
+    def result(self):
+        """
+        Verify the assembled value and return it.
+        :return: The value as bytes when assembling into memory, otherwise the sink.
+        """
+        if not self.done():
+            raise ValueError(f"Value is incomplete, {self.count - self.cursor} chunks missing")
+        if self.written != self.size or self.hasher.digest() != self.digest:
+            raise ValueError("Assembled value does not match the manifest digest")
+        if self.in_memory:
+            return self.sink.getvalue()
+        return self.sink
@@ -0,0 +1,105 @@
+from bisect import bisect_left, insort
+from threading import Lock
+from typing import Iterator, List, Tuple
+from pydemlia.utils.uid import UID
+
+KEY_SPACE = 1 << (UID.ID_LENGTH * 8)
+
+
+def _aligned_blocks(lo: int, hi: int) -> Iterator[Tuple[int, int]]:
+    """
+    Split [lo, hi) into blocks [start, start + size) whose size is a power of two and whose
+    start is a multiple of their size. There are at most two blocks per bit.
+    """
+    while lo < hi:
+        size = lo & -lo if lo else KEY_SPACE
+        while size > hi - lo:
+            size >>= 1
+        yield lo, size
+        lo += size
+
+
+class LocalStore:
+    def __init__(self):
+        """
+        Local key-value store, keys are UIDs kept in a sorted index for range scans.
+        """
+        self.values = {}  # UID -> value
+        self.index: List[int] = []  # Sorted integer values of the stored keys
+        self.lock = Lock()
+
+    def __setitem__(self, key: UID, value):
+        with self.lock:
+            if key not in self.values:
+                insort(self.index, key.get_int())
+            self.values[key] = value
+
+    def __getitem__(self, key: UID):
+        return self.values[key]
+
+    def __delitem__(self, key: UID):
+        with self.lock:
+            del self.values[key]
+            del self.index[bisect_left(self.index, key.get_int())]
+
+    def __contains__(self, key) -> bool:
+        return key in self.values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __repr__(self):
+        return f"LocalStore({self.values})"
+
+    def get(self, key: UID, default=None):
+        return self.values.get(key, default)
+
+    def keys(self) -> List[UID]:
+        with self.lock:
+            return [UID(bid=k.to_bytes(UID.ID_LENGTH, "big")) for k in self.index]
+
+    def range(self, lo: int, hi: int) -> List[UID]:
+        """
+        Get the stored keys whose integer value is in [lo, hi), in ascending order.
+        """
+        with self.lock:
+            start, end = bisect_left(self.index, lo), bisect_left(self.index, hi)
+            return [UID(bid=k.to_bytes(UID.ID_LENGTH, "big")) for k in self.index[start:end]]
+
+    def xor_range(self, target: UID, lo: int, hi: int) -> List[UID]:
+        """
+        Get the stored keys whose XOR distance to the target is in [lo, hi).
+        The distance range is split into aligned blocks, each of which maps onto a single
+        contiguous range of keys, so only matching keys are visited.
+        """
+        t = target.get_int()
+        keys = []
+        for start, size in _aligned_blocks(lo, min(hi, KEY_SPACE)):
+            base = (start ^ t) & ~(size - 1)
+            keys.extend(self.range(base, base + size))
+        return keys
+
+    def bucket(self, local_id: UID, index: int) -> List[UID]:
+        """
+        Get the stored keys that fall into a KBucket of a routing table around `local_id`.
+        Bucket i holds distances [2^i, 2^(i+1)), bucket 0 also holds the local ID itself.
+        """
+        lo = 0 if index == 0 else 1 << index
+        return self.xor_range(local_id, lo, 1 << (index + 1))
+
+    def with_bit(self, bit: int, value: int) -> List[UID]:
+        """
+        Get the stored keys whose bit `bit` (0 being the least significant) equals `value`.
+        Such keys form every other block of 2^bit keys, runs of keys in the other blocks are
+        skipped with a binary search each.
+        """
+        keys = []
+        with self.lock:
+            position = 0
+            while position < len(self.index):
+                block = self.index[position] >> bit
+                end = bisect_left(self.index, (block + 1) << bit, position)
+                if block & 1 == value:
+                    keys.extend(self.index[position:end])
+                position = end
+        return [UID(bid=k.to_bytes(UID.ID_LENGTH, "big")) for k in keys]
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+from collections import deque
+import bencoder
+from pydemlia.network import MAX_DATAGRAM_SIZE, decode_message
+from pydemlia.transport.base import Transport, address_family
+
+BACKLOG_SIZE = 256  # Messages kept for sending while the socket is not bound yet, the oldest are dropped
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, transport: 'AsyncioUDPTransport'):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.transport.handle_message(data, addr[:2])
+
+    def error_received(self, exc):
+        print(f"Error receiving message: {exc}")
+
+
+class AsyncioUDPTransport(Transport):
+    def __init__(self, host, port, loop=None):
+        """
+        UDP transport running on an asyncio event loop. Handlers are called on the loop's
+        thread, so blocking DHT calls such as `get` must be made from other threads.
+        :param host: IPv4 or IPv6 address to bind to.
+        :param port: Port to bind to.
+        :param loop: Event loop to use, a new one by default.
+        """
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.loop = loop or asyncio.new_event_loop()
+        self.endpoint = None  # asyncio.DatagramTransport once started
+        self.backlog = deque(maxlen=BACKLOG_SIZE)  # (data, address) sent before the endpoint existed
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+
+    async def start(self):
+        """Bind the socket, for use from code already running on the loop."""
+        endpoint, _ = await self.loop.create_datagram_endpoint(
+            lambda: _DatagramProtocol(self), local_addr=(self.host, self.port))
+        self.port = endpoint.get_extra_info("sockname")[1]
+        with self.lock:
+            self.endpoint = endpoint
+            backlog, self.backlog = self.backlog, deque(maxlen=BACKLOG_SIZE)
+        for data, address in backlog:
+            self._sendto(data, address)
+        self.ready.set()
+
+    def get_families(self):
+        return [address_family(self.host)]
+
+    def handle_message(self, data, addr):
+        if len(data) > MAX_DATAGRAM_SIZE:
+            return
+        try:
+            parsed_message = decode_message(data)
+        except (bencoder.BTFailure, ValueError, TypeError) as e:
+            print(f"Failed to decode message from {addr}: {e}")
+            return
+        self.dispatch(parsed_message, addr)
+
+    def send(self, message, address):
+        """
+        Send a message, messages sent before the socket is bound are queued until it is.
+        """
+        try:
+            serialized_message = bencoder.bencode(message)
+            with self.lock:
+                if self.endpoint is None:
+                    self.backlog.append((serialized_message, address))
+                    return
+            if self._on_loop():
+                self._sendto(serialized_message, address)
+            else:
+                self.loop.call_soon_threadsafe(self._sendto, serialized_message, address)
+        except Exception as e:
+            print(f"Error sending message to {address}: {e}")
+
+    def _sendto(self, data, address):
+        try:
+            self.endpoint.sendto(data, address)
+        except Exception as e:
+            print(f"Error sending message to {address}: {e}")
+
+    def _on_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def receive(self):
+        """Run the event loop on the calling thread until `shutdown` is called."""
+        self.loop.run_until_complete(self.start())
+        self.loop.run_forever()
+        self.endpoint.close()
+        self.loop.run_until_complete(asyncio.sleep(0))  # Let the endpoint finish closing
+        self.loop.close()
+
+    def shutdown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
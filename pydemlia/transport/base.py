@@ -0,0 +1,49 @@
+import socket
+from abc import ABC, abstractmethod
+
+
+def address_family(ip: str) -> int:
+    return socket.AF_INET6 if ":" in ip else socket.AF_INET
+
+
+class Transport(ABC):
+    """
+    Contract between the DHT and the network below it. Handlers are registered per
+    operation and called with (message, addr), where `message` is a decoded dict with
+    `str` keys. `send` delivers a message dict to an address.
+    """
+
+    def __init__(self):
+        self.handlers = {}  # Map operations to handler methods
+
+    def register_handler(self, operation, handler):
+        """Register a handler for a specific operation."""
+        self.handlers[operation] = handler
+
+    def dispatch(self, message, addr):
+        """Call the handler registered for the message's operation."""
+        operation = message.get('operation')
+        if operation in self.handlers:
+            self.handlers[operation](message, addr)
+        else:
+            print(f"Unknown operation: {operation}")
+
+    def get_families(self):
+        """Address families this transport can reach."""
+        return [socket.AF_INET]
+
+    @abstractmethod
+    def send(self, message, address):
+        """
+        Send a message dict to an (ip, port) address. Delivery is best effort and send does not
+        raise, messages that cannot be sent are logged and dropped like lost datagrams. The
+        exception is a LoopbackHub in encode mode, which raises so tests catch such messages.
+        """
+
+    @abstractmethod
+    def receive(self):
+        """Deliver incoming messages to the handlers until `shutdown` is called."""
+
+    @abstractmethod
+    def shutdown(self):
+        """Stop receiving and release the transport's resources."""
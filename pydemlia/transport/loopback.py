@@ -0,0 +1,145 @@
+import random
+from collections import deque
+from threading import Condition, Thread
+from typing import Optional
+import bencoder
+from pydemlia.network import MAX_DATAGRAM_SIZE, decode_message
+from pydemlia.transport.base import Transport, address_family
+
+
+class LoopbackHub:
+    def __init__(self, loss: float = 0.0, seed: Optional[int] = None, encode: bool = False):
+        """
+        In-process network connecting LoopbackTransports. Message dicts are handed to the
+        receiver as they are, without serialization or syscalls, and delivered in send order.
+        :param loss: Fraction of messages to drop.
+        :param seed: Seed of the loss generator, for reproducible runs.
+        :param encode: Bencode messages on send and decode them on delivery like the UDP
+                       transports do, so handlers see the same types as on the wire. Messages
+                       that cannot be encoded or exceed a datagram raise on send, where the UDP
+                       transports would log and drop them.
+        """
+        self.encode = encode
+        self.transports = {}  # Address -> transport
+        self.queue = deque()  # (destination, message, source) waiting for delivery
+        self.condition = Condition()
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.next_port = 1
+        self.delivered = 0
+        self.dropped = 0
+        self.running = False
+        self.thread = None
+
+    def create_transport(self, addr: Optional[tuple] = None) -> 'LoopbackTransport':
+        """
+        Attach a new transport to the hub.
+        :param addr: Address of the transport, a free 127.0.0.1 port by default.
+        """
+        with self.condition:
+            if addr is None:
+                while ("127.0.0.1", self.next_port) in self.transports:
+                    self.next_port += 1
+                addr = ("127.0.0.1", self.next_port)
+            if addr in self.transports:
+                raise ValueError(f"Address {addr} is already in use")
+            transport = LoopbackTransport(self, addr)
+            self.transports[addr] = transport
+            return transport
+
+    def detach(self, addr: tuple):
+        with self.condition:
+            self.transports.pop(addr, None)
+
+    def post(self, message, source: tuple, destination: tuple):
+        if self.encode:
+            message = bencoder.bencode(message)
+            if len(message) > MAX_DATAGRAM_SIZE:
+                raise ValueError(f"Message of {len(message)} bytes does not fit into a datagram")
+        with self.condition:
+            self.queue.append((destination, message, source))
+            self.condition.notify()
+
+    def step(self) -> bool:
+        """
+        Deliver the oldest queued message.
+        :return: False if the queue was empty.
+        """
+        with self.condition:
+            if not self.queue:
+                return False
+            destination, message, source = self.queue.popleft()
+            transport = self.transports.get(destination)
+            if transport is None or (self.loss and self.random.random() < self.loss):
+                self.dropped += 1
+                return True
+            self.delivered += 1
+        try:
+            if self.encode:
+                message = decode_message(message)
+            transport.dispatch(message, source)
+        except Exception as e:
+            # A failing handler must not stop delivery to every other node
+            print(f"Error handling message from {source} at {destination}: {e}")
+        return True
+
+    def run(self, limit: Optional[int] = None) -> int:
+        """
+        Deliver messages on the calling thread until the queue is empty, including the
+        messages sent by the handlers. Runs are deterministic for a given seed.
+        :param limit: Maximum number of messages to process.
+        :return: Number of messages processed.
+        """
+        count = 0
+        while (limit is None or count < limit) and self.step():
+            count += 1
+        return count
+
+    def start(self):
+        """
+        Deliver messages on a background thread, for callers that block waiting for replies.
+        """
+        with self.condition:
+            self.running = True
+        self.thread = Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while True:
+            with self.condition:
+                while self.running and not self.queue:
+                    self.condition.wait()
+                if not self.running:
+                    return
+            self.step()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+class LoopbackTransport(Transport):
+    def __init__(self, hub: LoopbackHub, addr: tuple):
+        """
+        Transport attached to a LoopbackHub, create it with `LoopbackHub.create_transport`.
+        """
+        super().__init__()
+        self.hub = hub
+        self.addr = addr
+
+    def get_families(self):
+        return [address_family(self.addr[0])]
+
+    def send(self, message, address):
+        self.hub.post(message, self.addr, tuple(address))
+
+    def receive(self):
+        """Messages are delivered by the hub, this drains its queue on the calling thread."""
+        self.hub.run()
+
+    def shutdown(self):
+        self.hub.detach(self.addr)
@@ -0,0 +1,38 @@
+from typing import Callable, Generic, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+class LazyList(Generic[T]):
+    def __init__(self, size: int, factory: Callable[[], T]):
+        """
+        Fixed size list whose items are only created when first accessed.
+        :param size: Number of items.
+        :param factory: Creates an item.
+        """
+        self.size = size
+        self.factory = factory
+        self.items = {}  # Index -> item, only for allocated items
+
+    def __getitem__(self, index: int) -> T:
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("LazyList index out of range")
+        item = self.items.get(index)
+        if item is None:
+            item = self.items[index] = self.factory()
+        return item
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[T]:
+        """Iterate over all items, allocating the missing ones."""
+        for index in range(self.size):
+            yield self[index]
+
+    def allocated(self) -> Iterator[T]:
+        """Iterate over the items created so far, in index order."""
+        for index in sorted(self.items):
+            yield self.items[index]
@@ -0,0 +1,162 @@
+import time
+import zlib
+from threading import Lock
+from typing import Dict, Iterable, Optional, Tuple
+
+MIN_COMPRESS_SIZE = 128  # Payloads smaller than this are never worth the CPU time
+MAX_COMPRESS_RATIO = 0.9  # Compressed payloads above this fraction of the original are sent raw
+PROBE_INTERVAL = 32  # Payloads skipped by a raised threshold before compression is tried again
+MAX_DECOMPRESSED_SIZE = 65536  # Default output limit, payloads come from untrusted peers
+
+
+def _zlib_decompress(payload: bytes, max_size: int) -> bytes:
+    decompressor = zlib.decompressobj()
+    data = decompressor.decompress(payload, max_size + 1)
+    if len(data) <= max_size and not decompressor.eof:
+        raise ValueError("Truncated zlib stream")
+    return data
+
+
+# Codec name -> (compress, decompress(payload, max_size)). Decompressors return at most
+# max_size + 1 bytes, so `decompress` can tell when the limit was exceeded.
+CODECS = {
+    "zlib": (zlib.compress, _zlib_decompress),
+}
+
+try:
+    import lz4.frame
+
+    def _lz4_decompress(payload: bytes, max_size: int) -> bytes:
+        decompressor = lz4.frame.LZ4FrameDecompressor()
+        data = decompressor.decompress(payload, max_length=max_size + 1)
+        if len(data) <= max_size and not decompressor.eof:
+            raise ValueError("Truncated lz4 frame")
+        return data
+
+    CODECS["lz4"] = (lz4.frame.compress, _lz4_decompress)
+except ImportError:
+    pass
+
+try:
+    import zstandard
+
+    # Compressor and decompressor objects are not thread-safe, handlers get one per call
+    def _zstd_compress(payload: bytes) -> bytes:
+        return zstandard.ZstdCompressor().compress(payload)
+
+    def _zstd_decompress(payload: bytes, max_size: int) -> bytes:
+        # max_output_size only applies to frames without a content size, check the header first
+        if zstandard.frame_content_size(payload) > max_size:
+            raise ValueError(f"Frame content size exceeds {max_size} bytes")
+        return zstandard.ZstdDecompressor().decompress(payload, max_output_size=max_size + 1)
+
+    CODECS["zstd"] = (_zstd_compress, _zstd_decompress)
+except ImportError:
+    pass
+
+PREFERENCE = ("zstd", "lz4", "zlib")  # Best codec first
+
+
+def available_codecs():
+    """Names of the codecs supported locally, in order of preference."""
+    return [name for name in PREFERENCE if name in CODECS]
+
+
+def negotiate(offered: Iterable) -> Optional[str]:
+    """
+    Pick the preferred codec supported by both sides.
+    :param offered: Codec names advertised by the peer, as `str` or `bytes`.
+    :return: The codec name, or None if there is no common codec.
+    """
+    offered = {name.decode() if isinstance(name, bytes) else name for name in offered}
+    for name in available_codecs():
+        if name in offered:
+            return name
+    return None
+
+
+def decompress(codec: str, payload: bytes, max_size: int = MAX_DECOMPRESSED_SIZE) -> bytes:
+    """
+    Decompress a payload received from a peer.
+    :param max_size: Largest acceptable output, payloads inflating beyond it are rejected
+                     without being decompressed in full.
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unsupported compression codec: {codec}")
+    try:
+        data = CODECS[codec][1](payload, max_size)
+    except Exception as e:
+        raise ValueError(f"Failed to decompress {codec} payload: {e}")
+    if len(data) > max_size:
+        raise ValueError(f"Decompressed {codec} payload exceeds {max_size} bytes")
+    return data
+
+
+class CompressionStats:
+    def __init__(self):
+        self.count = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_time = 0.0  # Seconds of process time spent compressing
+
+    def ratio(self) -> float:
+        """Compressed size as a fraction of the original size, 1.0 when nothing was compressed."""
+        return self.bytes_out / self.bytes_in if self.bytes_in else 1.0
+
+    def __repr__(self):
+        return f"CompressionStats(count={self.count}, skipped={self.skipped}, ratio={self.ratio():.3f}, cpu_time={self.cpu_time:.6f})"
+
+
+class Compressor:
+    def __init__(self, min_size: int = MIN_COMPRESS_SIZE, max_ratio: float = MAX_COMPRESS_RATIO):
+        """
+        Compress payloads whenever it pays off.
+        :param min_size: Lower bound of the adaptive size threshold.
+        :param max_ratio: Compressed payloads above this fraction of the original are discarded.
+        """
+        self.min_size = min_size
+        self.max_ratio = max_ratio
+        self.threshold = min_size  # Payloads below this size are sent raw
+        self.probe = 0
+        self.stats: Dict[str, CompressionStats] = {}
+        self.lock = Lock()
+
+    def compress(self, codec: Optional[str], payload: bytes) -> Tuple[Optional[str], bytes]:
+        """
+        Compress a payload with the given codec.
+        The size threshold doubles each time compression does not reach `max_ratio` and halves
+        back towards `min_size` when it does, so incompressible traffic costs little CPU time.
+        :param codec: Codec negotiated with the peer, None if there is none.
+        :param payload: Payload to compress.
+        :return: The codec used, or None when the payload is sent raw, and the payload.
+        """
+        if codec not in CODECS:
+            return None, payload
+
+        with self.lock:
+            stats = self.stats.setdefault(codec, CompressionStats())
+            if len(payload) < self.min_size:
+                stats.skipped += 1
+                return None, payload
+            if len(payload) < self.threshold:
+                self.probe += 1
+                if self.probe % PROBE_INTERVAL != 0:
+                    stats.skipped += 1
+                    return None, payload
+
+        start = time.process_time()
+        compressed = CODECS[codec][0](payload)
+        elapsed = time.process_time() - start
+
+        with self.lock:
+            stats.count += 1
+            stats.bytes_in += len(payload)
+            stats.bytes_out += len(compressed)
+            stats.cpu_time += elapsed
+
+            if len(compressed) > len(payload) * self.max_ratio:
+                self.threshold = max(self.threshold, len(payload)) * 2
+                return None, payload
+            self.threshold = max(self.min_size, self.threshold // 2)
+        return codec, compressed
@@ -42,6 +42,41 @@ class Node:
         """
         return self.port
 
+    def get_family(self) -> int:
+        """
+        Get the address family of the node, `socket.AF_INET` or `socket.AF_INET6`.
+        """
+        import socket
+
+        return socket.AF_INET6 if ":" in self.ip else socket.AF_INET
+
+    def serialize(self) -> bytes:
+        """
+        Compact node info: the 20 byte ID, the packed IPv4 or IPv6 address and the port in network byte order.
+        """
+        import socket
+
+        return self.id.get_bytes() + socket.inet_pton(self.get_family(), self.ip) + self.port.to_bytes(2, "big")
+
+    @staticmethod
+    def deserialize(data: bytes) -> 'Node':
+        """
+        Parse compact node info, the address family follows from the length (26 or 38 bytes).
+        """
+        import socket
+
+        ip_length = len(data) - UID.ID_LENGTH - 2
+        if ip_length == 4:
+            family = socket.AF_INET
+        elif ip_length == 16:
+            family = socket.AF_INET6
+        else:
+            raise ValueError(f"Compact node info must be {UID.ID_LENGTH + 6} or {UID.ID_LENGTH + 18} bytes, got {len(data)}")
+        uid = UID(bid=bytes(data[:UID.ID_LENGTH]))
+        ip = socket.inet_ntop(family, data[UID.ID_LENGTH:UID.ID_LENGTH + ip_length])
+        port = int.from_bytes(data[-2:], "big")
+        return Node(uid, ip=ip, port=port)
+
     def has_queried(self, now: int) -> bool:
         """Check if the node has been queried recently."""
         return now - self.last_seen < 5000
@@ -0,0 +1,128 @@
+import socket
+import struct
+import time
+from threading import Lock
+from typing import Iterator, Optional, Tuple
+
+MAGIC = b"PDTR\x01"
+# timestamp, address family (4 or 6), port, payload length; followed by the packed IP and the payload
+RECORD = struct.Struct("<dBHI")
+
+
+class TraceWriter:
+    def __init__(self, path: str):
+        """
+        Capture received datagrams to a binary trace file.
+        :param path: Path of the trace file, truncated if it exists.
+        """
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.lock = Lock()
+
+    def write(self, data: bytes, addr: tuple, timestamp: Optional[float] = None):
+        """
+        Append a datagram to the trace.
+        :param data: The raw datagram.
+        :param addr: Source address as returned by `recvfrom`.
+        :param timestamp: Receive time in seconds, defaults to now.
+        """
+        ip, port = addr[0], addr[1]
+        family = 6 if ":" in ip else 4
+        packed_ip = socket.inet_pton(socket.AF_INET6 if family == 6 else socket.AF_INET, ip)
+        header = RECORD.pack(time.time() if timestamp is None else timestamp, family, port, len(data))
+        with self.lock:
+            self.file.write(header + packed_ip + data)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_trace(path: str) -> Iterator[Tuple[float, bytes, tuple]]:
+    """
+    Read a trace file.
+    :param path: Path of the trace file.
+    :return: Iterator of (timestamp, datagram, address) tuples in capture order.
+    """
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a pydemlia trace file")
+        while True:
+            header = file.read(RECORD.size)
+            if not header:
+                return
+            if len(header) < RECORD.size:
+                raise ValueError(f"Truncated record in {path}")
+            timestamp, family, port, length = RECORD.unpack(header)
+            packed_ip = file.read(16 if family == 6 else 4)
+            data = file.read(length)
+            if len(data) < length:
+                raise ValueError(f"Truncated record in {path}")
+            ip = socket.inet_ntop(socket.AF_INET6 if family == 6 else socket.AF_INET, packed_ip)
+            yield timestamp, data, (ip, port)
+
+
+class ReplayReport:
+    def __init__(self):
+        self.messages = 0
+        self.elapsed = 0.0  # Wall clock seconds spent replaying
+        self.profile = None  # cProfile.Profile when profiling was enabled
+        self.memory_peak = None  # Peak traced memory in bytes when memory tracing was enabled
+        self.memory_snapshot = None  # tracemalloc.Snapshot taken at the end of the replay
+
+    def rate(self) -> float:
+        """Messages handled per second."""
+        return self.messages / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return f"ReplayReport(messages={self.messages}, elapsed={self.elapsed:.6f}, rate={self.rate():.1f}/s)"
+
+
+def replay(path: str, handler, paced: bool = False, profile: bool = False, trace_memory: bool = False) -> ReplayReport:
+    """
+    Feed a trace back through a message handler, e.g. `Network.handle_message`.
+    Messages are handled synchronously and in capture order, so replays are deterministic.
+    :param path: Path of the trace file.
+    :param handler: Callable taking (datagram, address).
+    :param paced: Sleep to reproduce the recorded inter-arrival times instead of replaying at full speed.
+    :param profile: Run the replay under cProfile.
+    :param trace_memory: Track allocations with tracemalloc.
+    :return: A ReplayReport.
+    """
+    report = ReplayReport()
+    records = list(read_trace(path))  # Keep file IO out of the measurement
+
+    if profile:
+        import cProfile
+        report.profile = cProfile.Profile()
+    if trace_memory:
+        import tracemalloc
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    first = records[0][0] if records else 0.0
+    if report.profile is not None:
+        report.profile.enable()
+    try:
+        for timestamp, data, addr in records:
+            if paced:
+                delay = (timestamp - first) - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            handler(data, addr)
+            report.messages += 1
+    finally:
+        if report.profile is not None:
+            report.profile.disable()
+        report.elapsed = time.perf_counter() - start
+        if trace_memory:
+            report.memory_peak = tracemalloc.get_traced_memory()[1]
+            report.memory_snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+    return report
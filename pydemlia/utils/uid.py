@@ -20,6 +20,20 @@ class UID:
         else:
             raise ValueError("Either `key` or `bid` must be provided")
 
+    @staticmethod
+    def from_key(key) -> 'UID':
+        """
+        Map a DHT key onto the 160-bit key space. UIDs are kept as they are, strings and
+        bytes are hashed with SHA1.
+        """
+        import hashlib
+
+        if isinstance(key, UID):
+            return key
+        if isinstance(key, str):
+            key = key.encode()
+        return UID(bid=hashlib.sha1(key).digest())
+
     def get_distance(self, k: 'UID') -> int:
         return (UID.ID_LENGTH * 8) - self.xor(k.bid).get_first_set_bit_index()
 
@@ -0,0 +1,115 @@
+import io
+import os
+import unittest
+from pydemlia.storage.chunk import ChunkAssembler, chunk_digest, split_value
+
+class TestChunk(unittest.TestCase):
+    def setUp(self):
+        """
+        Create a value spanning several chunks.
+        """
+        self.chunk_size = 256
+        self.value = os.urandom(self.chunk_size * 5 + 10)
+        self.manifest, self.chunks = split_value(self.value, self.chunk_size)
+
+    def test_split_value(self):
+        """
+        Test that chunks are content addressed and cover the whole value.
+        """
+        self.assertEqual(len(self.chunks), 6)
+        self.assertEqual(self.manifest["size"], len(self.value))
+        self.assertEqual(self.manifest["digest"], chunk_digest(self.value))
+        self.assertEqual(b"".join(bytes(chunk) for _, chunk in self.chunks), self.value)
+        for digest, chunk in self.chunks:
+            self.assertEqual(digest, chunk_digest(chunk))
+
+    def test_split_value_nested_index(self):
+        """
+        Test that a chunk index which does not fit into a chunk is chunked itself.
+        """
+        manifest, chunks = split_value(os.urandom(100 * 10), 100)
+        self.assertNotIn("chunks", manifest)
+        self.assertIn("chunks", manifest["index"])
+        self.assertEqual(len(chunks), 10 + 2)  # 200 bytes of digests need 2 more chunks
+
+    def test_assemble_out_of_order(self):
+        """
+        Test assembling a value from chunks arriving in reverse order.
+        """
+        assembler = ChunkAssembler(self.manifest)
+        for digest, chunk in reversed(self.chunks):
+            self.assertFalse(assembler.done())
+            self.assertTrue(assembler.add(digest, bytes(chunk)))
+        self.assertTrue(assembler.done())
+        self.assertEqual(assembler.result(), self.value)
+
+    def test_assemble_into_sink(self):
+        """
+        Test streaming the value into a caller supplied sink.
+        """
+        sink = io.BytesIO()
+        assembler = ChunkAssembler(self.manifest, sink)
+        for digest, chunk in self.chunks:
+            assembler.add(digest, bytes(chunk))
+        self.assertIs(assembler.result(), sink)
+        self.assertEqual(sink.getvalue(), self.value)
+
+    def test_reject_corrupted_chunk(self):
+        """
+        Test that chunks failing the integrity check are ignored.
+        """
+        assembler = ChunkAssembler(self.manifest)
+        digest, chunk = self.chunks[0]
+        self.assertFalse(assembler.add(digest, b"x" * len(chunk)))
+        self.assertFalse(assembler.add(digest, 123))
+        self.assertTrue(assembler.add(digest, bytes(chunk)))
+
+    def test_repeated_chunks(self):
+        """
+        Test a value whose chunks have identical content.
+        """
+        value = b"\x00" * (self.chunk_size * 3)
+        manifest, chunks = split_value(value, self.chunk_size)
+        assembler = ChunkAssembler(manifest)
+        self.assertEqual(len(list(assembler.next_requests(10))), 1)
+        digest, chunk = chunks[0]
+        assembler.add(digest, bytes(chunk))
+        self.assertEqual(assembler.result(), value)
+
+    def test_request_window(self):
+        """
+        Test that requests never run further ahead of the cursor than the window.
+        """
+        assembler = ChunkAssembler(self.manifest)
+        digests = [digest for digest, _ in self.chunks]
+        self.assertEqual(list(assembler.next_requests(2)), digests[:2])
+        assembler.add(digests[1], bytes(self.chunks[1][1]))
+        self.assertEqual(list(assembler.next_requests(2)), [])  # Chunk 0 is still missing
+        self.assertEqual(assembler.missing(), digests[:1])
+        assembler.add(digests[0], bytes(self.chunks[0][1]))
+        self.assertEqual(list(assembler.next_requests(2)), digests[2:4])
+
+    def test_overdue_requests(self):
+        """
+        Test that each request in flight times out on its own.
+        """
+        assembler = ChunkAssembler(self.manifest)
+        digests = [digest for digest, _ in self.chunks]
+        list(assembler.next_requests(1, now=0.0))
+        list(assembler.next_requests(2, now=5.0))
+        self.assertEqual(assembler.next_timeout(1.0), 1.0)
+        self.assertEqual(assembler.overdue(1.0, 1.0), digests[:1])
+        self.assertEqual(assembler.overdue(1.5, 1.0), [])
+        self.assertEqual(assembler.next_timeout(1.0), 2.0)
+        self.assertEqual(sorted(assembler.overdue(6.0, 1.0)), sorted(digests[:2]))
+
+    def test_incomplete_result(self):
+        """
+        Test that an incomplete value cannot be returned.
+        """
+        assembler = ChunkAssembler(self.manifest)
+        with self.assertRaises(ValueError):
+            assembler.result()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from pydemlia.utils.collections import LazyList
+
+class TestCollections(unittest.TestCase):
+    def test_lazy_list_allocation(self):
+        """
+        Test that items are only created on first access.
+        """
+        created = []
+        lazy = LazyList(160, lambda: created.append(1) or object())
+        self.assertEqual(len(lazy), 160)
+        self.assertEqual(list(lazy.allocated()), [])
+
+        item = lazy[42]
+        self.assertIs(lazy[42], item)
+        self.assertIs(lazy[-118], item)
+        self.assertEqual(list(lazy.allocated()), [item])
+        self.assertEqual(len(created), 1)
+
+    def test_lazy_list_bounds(self):
+        """
+        Test that indexes outside the list raise an IndexError.
+        """
+        lazy = LazyList(4, object)
+        with self.assertRaises(IndexError):
+            lazy[4]
+        with self.assertRaises(IndexError):
+            lazy[-5]
+
+    def test_lazy_list_iteration(self):
+        """
+        Test that iterating yields every item.
+        """
+        lazy = LazyList(4, list)
+        self.assertEqual(len(list(lazy)), 4)
+        self.assertEqual(len(list(lazy.allocated())), 4)
+
+if __name__ == '__main__':
+    unittest.main()
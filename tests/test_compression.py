@@ -0,0 +1,87 @@
+import json
+import os
+import unittest
+from pydemlia.utils.compression import Compressor, MIN_COMPRESS_SIZE, PROBE_INTERVAL, available_codecs, decompress, negotiate
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        """
+        Create a compressor and a redundant JSON-like payload.
+        """
+        self.compressor = Compressor()
+        self.payload = json.dumps([{"name": f"node-{i}", "status": "online"} for i in range(50)]).encode()
+
+    def test_negotiate(self):
+        """
+        Test that negotiation picks a common codec.
+        """
+        self.assertIn("zlib", available_codecs())
+        self.assertEqual(negotiate([b"zlib", b"unknown"]), "zlib")
+        self.assertIsNone(negotiate(["unknown"]))
+        self.assertIsNone(negotiate([]))
+
+    def test_roundtrip(self):
+        """
+        Test compressing and decompressing a payload.
+        """
+        codec, compressed = self.compressor.compress("zlib", self.payload)
+        self.assertEqual(codec, "zlib")
+        self.assertLess(len(compressed), len(self.payload))
+        self.assertEqual(decompress(codec, compressed), self.payload)
+
+        stats = self.compressor.stats["zlib"]
+        self.assertEqual(stats.count, 1)
+        self.assertLess(stats.ratio(), 1.0)
+
+    def test_no_codec(self):
+        """
+        Test that payloads are sent raw without a negotiated codec.
+        """
+        self.assertEqual(self.compressor.compress(None, self.payload), (None, self.payload))
+
+    def test_small_payload_skipped(self):
+        """
+        Test that payloads below the minimum size are not compressed.
+        """
+        payload = b"a" * (MIN_COMPRESS_SIZE - 1)
+        self.assertEqual(self.compressor.compress("zlib", payload), (None, payload))
+        self.assertEqual(self.compressor.stats["zlib"].skipped, 1)
+
+    def test_adaptive_threshold(self):
+        """
+        Test that incompressible payloads raise the threshold until compression pays off again.
+        """
+        noise = os.urandom(1024)
+        self.assertEqual(self.compressor.compress("zlib", noise), (None, noise))
+        self.assertGreater(self.compressor.threshold, len(noise))
+
+        # Smaller payloads are skipped, apart from periodic probes
+        results = [self.compressor.compress("zlib", self.payload)[0] for _ in range(PROBE_INTERVAL)]
+        self.assertEqual(results.count("zlib"), 1)
+        self.assertLess(self.compressor.threshold, len(noise) * 2)
+
+    def test_decompress_limit(self):
+        """
+        Test that payloads inflating beyond the limit are rejected, for every available codec.
+        """
+        bomb = b"\x00" * 10_000_000
+        for codec in available_codecs():
+            compressed = Compressor().compress(codec, bomb)[1]
+            self.assertLess(len(compressed), 65507)
+            with self.assertRaises(ValueError):
+                decompress(codec, compressed, 2048)
+            self.assertEqual(decompress(codec, Compressor().compress(codec, self.payload)[1], len(self.payload)), self.payload)
+            with self.assertRaises(ValueError):
+                decompress(codec, Compressor().compress(codec, self.payload)[1][:-8])
+
+    def test_decompress_invalid(self):
+        """
+        Test that corrupted or unknown payloads raise a ValueError.
+        """
+        with self.assertRaises(ValueError):
+            decompress("zlib", b"not compressed")
+        with self.assertRaises(ValueError):
+            decompress("unknown", b"")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from pydemlia.routing.consensus import VoteTracker
+
+class TestVoteTracker(unittest.TestCase):
+    def setUp(self):
+        """
+        Create a tracker with a small window for testing.
+        """
+        self.tracker = VoteTracker(window=8, min_votes=4)
+
+    def test_no_consensus_below_min_votes(self):
+        """
+        Test that no consensus is reported before enough votes arrived.
+        """
+        for i in range(3):
+            self.assertIsNone(self.tracker.vote(f"10.0.0.{i}", "1.2.3.4"))
+        self.assertEqual(self.tracker.vote("10.0.0.3", "1.2.3.4"), "1.2.3.4")
+
+    def test_majority_when_min_votes_reached(self):
+        """
+        Test that an address holding the majority is reported once enough votes arrived, whatever the last vote was.
+        """
+        for i in range(3):
+            self.tracker.vote(f"10.0.0.{i}", "1.2.3.4")
+        self.assertEqual(self.tracker.vote("10.0.0.3", "5.6.7.8"), "1.2.3.4")
+
+    def test_strict_majority(self):
+        """
+        Test that a tie does not produce a consensus.
+        """
+        for i in range(2):
+            self.tracker.vote(f"10.0.0.{i}", "1.2.3.4")
+        self.assertIsNone(self.tracker.vote("10.0.0.2", "5.6.7.8"))
+        self.assertIsNone(self.tracker.vote("10.0.0.3", "5.6.7.8"))
+        self.assertEqual(self.tracker.vote("10.0.0.4", "5.6.7.8"), "5.6.7.8")
+
+    def test_source_revote(self):
+        """
+        Test that a source only holds a single vote.
+        """
+        for _ in range(5):
+            self.tracker.vote("10.0.0.1", "1.2.3.4")
+        self.assertEqual(len(self.tracker), 1)
+        self.assertEqual(self.tracker.count("1.2.3.4"), 1)
+
+        self.tracker.vote("10.0.0.1", "5.6.7.8")
+        self.assertEqual(self.tracker.count("1.2.3.4"), 0)
+        self.assertEqual(self.tracker.count("5.6.7.8"), 1)
+
+    def test_sliding_window(self):
+        """
+        Test that the oldest votes expire once the window is full.
+        """
+        for i in range(8):
+            self.tracker.vote(f"10.0.0.{i}", "1.2.3.4")
+        for i in range(8, 12):
+            self.tracker.vote(f"10.0.0.{i}", "5.6.7.8")
+        self.assertEqual(len(self.tracker), 8)
+        self.assertEqual(self.tracker.count("1.2.3.4"), 4)
+        self.assertEqual(self.tracker.vote("10.0.0.12", "5.6.7.8"), "5.6.7.8")
+
+if __name__ == '__main__':
+    unittest.main()
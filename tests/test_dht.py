@@ -0,0 +1,203 @@
+import os
+import random
+import threading
+import time
+import unittest
+import zlib
+from collections import deque
+from pydemlia.dht import DHT, REPLICAS
+from pydemlia.network import ReplayNetwork
+from pydemlia.routing.table import verify_uid
+from pydemlia.rpc.quorum import ReadPolicy
+from pydemlia.storage.chunk import CHUNK_SIZE, Manifest, split_value
+from pydemlia.transport.loopback import LoopbackHub
+from pydemlia.utils.node import Node
+from pydemlia.utils.uid import UID
+
+class TestDHT(unittest.TestCase):
+    def setUp(self):
+        """
+        Create a DHT on a network that drops outgoing messages.
+        """
+        self.network = ReplayNetwork()
+        self.dht = DHT(node=Node(UID(key="1" * 40), ip="127.0.0.1", port=1337), network=self.network)
+
+    def test_dual_stack_lookup(self):
+        """
+        Test that lookups merge the routing tables of both families.
+        """
+        node4 = Node(UID(key="12" * 20), ip="127.0.0.2", port=1337)
+        node6 = Node(UID(key="13" * 20), ip="fd00::2", port=1337)
+        far4 = Node(UID(key="f0" * 20), ip="127.0.0.3", port=1337)
+        for node in (node4, node6, far4):
+            self.dht.insert_node(node)
+
+        self.assertEqual(self.dht.routing_table.get_all_nodes(), [node4, far4])
+        target = UID(key="1" * 40)
+        self.assertEqual(self.dht.find_closest_nodes(target, 2), [node6, node4])
+        self.assertEqual(self.dht.find_closest_nodes(target, 2, [node6.get_family()]), [node6])
+
+    def test_find_node_response(self):
+        """
+        Test that nodes returned by a lookup are added to the routing table of their family.
+        """
+        node6 = Node(UID(key="13" * 20), ip="fd00::2", port=1337)
+        self.network.handlers["FIND_NODE_RESPONSE"]({"closest_nodes": [node6.serialize(), b"bad"]}, ("fd00::2", 1337))
+        self.assertEqual(self.dht.find_closest_nodes(node6.get_uid(), 1), [node6])
+
+    def test_public_consensus(self):
+        """
+        Test that addresses reported in PONGs move the node and every routing table to a new UID.
+        """
+        sent = []
+        self.network.send = lambda message, addr: sent.append(message)
+        self.network.handlers["PING"]({"operation": "PING"}, ("1.2.3.4", 6881))
+        self.assertEqual(sent[0]["ip"], bytes([1, 2, 3, 4]))
+
+        old_uid = self.dht.node.get_uid()
+        table = self.dht.routing_tables[self.dht.node.get_family()]
+        for i in range(21):
+            self.network.handlers["PONG"]({"operation": "PONG", "ip": bytes([1, 2, 3, 4])}, (f"10.0.0.{i}", 1337))
+        table.restart_thread.join(timeout=5)
+
+        uid = self.dht.node.get_uid()
+        self.assertNotEqual(uid, old_uid)
+        self.assertTrue(verify_uid(uid, "1.2.3.4"))
+        self.assertTrue(all(table.local_id == uid for table in self.dht.routing_tables.values()))
+
+    def test_malformed_compressed_value(self):
+        """
+        Test that a compressed value which does not decode is answered with a failure.
+        """
+        sent = []
+        self.network.send = lambda message, addr: sent.append(message)
+        message = {"operation": "STORE", "key": b"k" * UID.ID_LENGTH, "value": zlib.compress(b"garbage"), "compression": "zlib"}
+        self.network.handlers["STORE"](message, ("127.0.0.2", 1337))
+        self.assertEqual(sent[0]["status"], "FAILURE")
+        self.assertNotIn(UID(bid=b"k" * UID.ID_LENGTH), self.dht.data_store)
+
+        self.network.handlers["FIND_VALUE_RESPONSE"](dict(message, status="FOUND"), ("127.0.0.2", 1337))
+
+    def test_handoff(self):
+        """
+        Test that a joining neighbour receives exactly the keys it is now a replica of.
+        """
+        rng = random.Random(3)
+        hub = LoopbackHub(encode=True)
+        a_id = rng.getrandbits(160)
+        b_id = a_id ^ (1 << 100) ^ rng.getrandbits(100)  # Shares the top 59 bits with a
+        a, b = [DHT(node=Node(UID(bid=uid.to_bytes(UID.ID_LENGTH, "big")), *transport.addr), network=transport)
+                for uid, transport in ((a_id, hub.create_transport()), (b_id, hub.create_transport()))]
+        others = [Node(UID(bid=rng.randbytes(UID.ID_LENGTH)), ip="127.0.1.1", port=i) for i in range(8)]
+        keys = [UID(bid=rng.randbytes(UID.ID_LENGTH)) for _ in range(1000)]
+        for i, key in enumerate(keys):
+            a.data_store[key] = i
+        for node in others:
+            a.insert_node(node)
+
+        def is_replica(key):
+            target = key.get_int()
+            closer = [node for node in others if node.get_uid().get_int() ^ target < b_id ^ target]
+            return b_id ^ target < a_id ^ target and len(closer) < REPLICAS
+
+        expected = {key for key in keys if is_replica(key)}
+        self.assertGreater(len(expected), 100)
+        self.assertEqual(set(a.affected_keys(b.node)), expected)
+
+        a.insert_node(b.node)
+        self.assertEqual(set(a.affected_keys(b.node)), expected)
+        a.handoff(b.node)
+        hub.run()
+        self.assertEqual(set(b.data_store.keys()), expected)
+        for key in expected:
+            self.assertEqual(b.data_store[key], a.data_store[key])
+
+    def test_string_keys(self):
+        """
+        Test that keys are hashed to UIDs on both ends.
+        """
+        hub = LoopbackHub(encode=True)
+        a, b = [DHT(node=Node(UID(bid=os.urandom(UID.ID_LENGTH)), *transport.addr), network=transport)
+                for transport in (hub.create_transport(), hub.create_transport())]
+        a.insert_node(b.node)
+        b.insert_node(a.node)
+
+        a.put("test", 123)
+        hub.run()
+        self.assertEqual(b.data_store[UID.from_key("test")], 123)
+
+        hub.start()
+        try:
+            self.assertEqual(a.get("test"), 123)
+        finally:
+            hub.stop()
+
+class TestQuorumRead(unittest.TestCase):
+    def setUp(self):
+        """
+        Create a reader and three replicas holding a value, ordered by distance to its key.
+        """
+        self.hub = LoopbackHub(encode=True)
+        self.reader, *replicas = [DHT(node=Node(UID(bid=os.urandom(UID.ID_LENGTH)), *transport.addr), network=transport)
+                                  for transport in [self.hub.create_transport() for _ in range(4)]]
+        self.uid = UID.from_key("key")
+        for replica in replicas:
+            self.reader.insert_node(replica.node)
+            replica.data_store[self.uid] = b"value"
+        order = [node.get_uid() for node in self.reader.find_closest_nodes(self.uid, 3)]
+        self.replicas = sorted(replicas, key=lambda replica: order.index(replica.node.get_uid()))
+        self.hub.start()
+
+    def tearDown(self):
+        self.hub.stop()
+
+    def test_silent_replica_is_hedged(self):
+        """
+        Test that the quorum is reached through a spare node when a replica never replies.
+        """
+        self.hub.detach(self.replicas[0].network.addr)
+        policy = ReadPolicy(replicas=2, quorum=2, hedges=1, timeout=5.0)
+        start = time.monotonic()
+        self.assertEqual(self.reader.get("key", policy), b"value")
+        self.assertLess(time.monotonic() - start, policy.timeout)
+        self.assertEqual(self.reader.pending_reads, {})
+
+    def test_late_reply_is_dropped(self):
+        """
+        Test that a read returns before a slow replica replies, and that the late reply is dropped.
+        """
+        slow = self.replicas[0]
+        slow.network.register_handler("FIND_VALUE", lambda message, addr: threading.Timer(1.0, slow.handle_find_value, (message, addr)).start())
+        self.hub.detach(self.replicas[1].network.addr)
+        start = time.monotonic()
+        self.assertEqual(self.reader.get("key", ReadPolicy(replicas=2, quorum=1, hedges=1)), b"value")
+        self.assertLess(time.monotonic() - start, 1.0)
+
+        time.sleep(1.2)
+        self.assertEqual(self.reader.pending_reads, {})
+        self.assertEqual(len(self.reader.latency.samples), 1)  # Only the hedged reply was measured
+
+    def test_local_copy(self):
+        """
+        Test that a value held by the reader itself is returned without querying other nodes.
+        """
+        self.hub.stop()
+        self.reader.data_store[self.uid] = b"value"
+        self.assertEqual(self.reader.get("key"), b"value")
+        self.assertEqual(self.hub.queue, deque())
+
+    def test_local_chunks(self):
+        """
+        Test that chunks held by the reader itself are not requested from other nodes.
+        """
+        self.hub.stop()
+        value = os.urandom(CHUNK_SIZE * 40)
+        manifest, chunks = split_value(value)
+        for digest, chunk in chunks:
+            self.reader.data_store[UID(bid=digest)] = bytes(chunk)
+        self.reader.data_store[self.uid] = Manifest(manifest)
+        self.assertEqual(self.reader.get("key"), value)
+        self.assertEqual(self.hub.queue, deque())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import socket
+import threading
+import time
+import unittest
+import bencoder
+from pydemlia.network import Network, decode_message
+
+class TestNetwork(unittest.TestCase):
+    def setUp(self):
+        """
+        Create a dual-stack network listening on loopback.
+        """
+        self.network = Network(host="127.0.0.1", port=0, host6="::1")
+        self.port = self.network.socket.getsockname()[1]
+        self.received = []
+        self.event = threading.Event()
+
+        def handler(message, addr):
+            self.received.append((message, addr))
+            self.event.set()
+
+        self.network.register_handler("PING", handler)
+        self.thread = threading.Thread(target=self.network.receive)
+        self.thread.start()
+
+    def tearDown(self):
+        self.network.shutdown()
+        self.thread.join()
+
+    def receive_from(self, family, host):
+        with socket.socket(family, socket.SOCK_DGRAM) as client:
+            client.sendto(bencoder.bencode({"operation": "PING"}), (host, self.port))
+            self.assertTrue(self.event.wait(5))
+            self.event.clear()
+            return self.received[-1]
+
+    def test_dual_stack(self):
+        """
+        Test that both families are served on the same port by a single receive loop.
+        """
+        self.assertEqual(set(self.network.get_families()), {socket.AF_INET, socket.AF_INET6})
+        message, addr = self.receive_from(socket.AF_INET, "127.0.0.1")
+        self.assertEqual(message, {"operation": "PING"})
+        self.assertEqual(addr[0], "127.0.0.1")
+
+        message, addr = self.receive_from(socket.AF_INET6, "::1")
+        self.assertEqual(addr[0], "::1")
+        self.assertEqual(len(addr), 2)
+
+    def test_invalid_host6(self):
+        """
+        Test that the second address must be IPv6.
+        """
+        with self.assertRaises(ValueError):
+            Network(host="127.0.0.1", port=0, host6="127.0.0.1")
+
+    def test_decode_message(self):
+        """
+        Test that keys and text fields are decoded, other strings are kept as bytes.
+        """
+        message = decode_message(bencoder.bencode({"operation": "STORE", "key": b"\\xff", "value": {"a": [1, b"b"]}}))
+        self.assertEqual(message, {"operation": "STORE", "key": b"\\xff", "value": {"a": [1, b"b"]}})
+        with self.assertRaises(ValueError):
+            decode_message(bencoder.bencode([1, 2]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -52,5 +52,25 @@ class TestNode(unittest.TestCase):
         other_node = Node(id=UID(key="2" * 40), ip="127.0.0.2", port=7777)
         self.assertTrue(self.node > other_node)
 
+    def test_serialize_ipv4(self):
+        # Test the compact node info round trip for IPv4
+        data = self.node.serialize()
+        self.assertEqual(len(data), 26)
+        node = Node.deserialize(data)
+        self.assertEqual((node.id, node.ip, node.port), (self.uid, "127.0.0.1", 12345))
+
+    def test_serialize_ipv6(self):
+        # Test the compact node info round trip for IPv6
+        node = Node(id=self.uid, ip="2001:db8::1", port=6881)
+        data = node.serialize()
+        self.assertEqual(len(data), 38)
+        node = Node.deserialize(data)
+        self.assertEqual((node.id, node.ip, node.port), (self.uid, "2001:db8::1", 6881))
+
+    def test_deserialize_invalid(self):
+        # Test that compact node info of the wrong length is rejected
+        with self.assertRaises(ValueError):
+            Node.deserialize(b"x" * 30)
+
 if __name__ == '__main__':
     unittest.main()
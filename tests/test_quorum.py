@@ -0,0 +1,81 @@
+import unittest
+from pydemlia.rpc.quorum import LatencyTracker, PendingRead, ReadPolicy
+
+class TestQuorum(unittest.TestCase):
+    def setUp(self):
+        """
+        Create a read waiting for two of three replies.
+        """
+        self.read = PendingRead(quorum=2, expected=3)
+        self.addrs = [("127.0.0.1", 1000 + i) for i in range(3)]
+        for addr in self.addrs:
+            self.read.sent(addr, 0.0)
+
+    def test_invalid_policy(self):
+        """
+        Test that a quorum larger than the number of queried nodes is rejected.
+        """
+        with self.assertRaises(ValueError):
+            ReadPolicy(replicas=2, quorum=5, hedges=1)
+        with self.assertRaises(ValueError):
+            ReadPolicy(quorum=0)
+
+    def test_quorum_reached(self):
+        """
+        Test that the read completes once the quorum of values has arrived.
+        """
+        self.assertTrue(self.read.add(self.addrs[0], True, b"a"))
+        self.assertFalse(self.read.done.is_set())
+        self.assertTrue(self.read.add(self.addrs[1], True, b"a"))
+        self.assertTrue(self.read.done.is_set())
+        self.assertEqual(self.read.result(), b"a")
+
+    def test_all_replied_without_quorum(self):
+        """
+        Test that the read completes when every queried node replied without enough values.
+        """
+        self.read.add(self.addrs[0], False)
+        self.read.add(self.addrs[1], False)
+        self.read.add(self.addrs[2], True, b"a")
+        self.assertTrue(self.read.done.is_set())
+        self.assertEqual(self.read.result(), b"a")
+
+    def test_duplicate_and_unsolicited_replies(self):
+        """
+        Test that replies are counted once per queried node.
+        """
+        self.assertTrue(self.read.add(self.addrs[0], True, b"a"))
+        self.assertFalse(self.read.add(self.addrs[0], True, b"a"))
+        self.assertFalse(self.read.add(("127.0.0.1", 1), True, b"a"))
+        self.assertFalse(self.read.done.is_set())
+
+    def test_majority_value(self):
+        """
+        Test that the value returned by most nodes wins.
+        """
+        read = PendingRead(quorum=3, expected=3)
+        for addr, value in zip(self.addrs, [{"v": 1}, {"v": 2}, {"v": 2}]):
+            read.sent(addr, 0.0)
+            read.add(addr, True, value)
+        self.assertEqual(read.result(), {"v": 2})
+
+    def test_no_value(self):
+        """
+        Test the result when no node had a value.
+        """
+        self.assertIsNone(self.read.result())
+
+    def test_hedge_delay(self):
+        """
+        Test that the hedge delay follows the recorded latency percentile.
+        """
+        tracker = LatencyTracker()
+        self.assertEqual(tracker.hedge_delay(0.95), LatencyTracker.DEFAULT_DELAY)
+        for i in range(1, 101):
+            tracker.record(i / 1000)
+        self.assertAlmostEqual(tracker.percentile(0.5), 0.051)
+        self.assertAlmostEqual(tracker.hedge_delay(0.95), 0.096)
+        self.assertAlmostEqual(tracker.percentile(1.0), 0.1)
+
+if __name__ == '__main__':
+    unittest.main()
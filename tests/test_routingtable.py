@@ -1,7 +1,7 @@
 import unittest
 from pydemlia.utils.uid import UID
 from pydemlia.utils.node import Node
-from pydemlia.routing.table import RoutingTable
+from pydemlia.routing.table import RoutingTable, SECURE_REJECT, verify_uid
 from pydemlia.routing.bucket import KBucket
 
 class TestRoutingTable(unittest.TestCase):
@@ -90,6 +90,96 @@ class TestRoutingTable(unittest.TestCase):
         target_uid = UID(key="77" * 20)
         closest_nodes = self.routing_table.find_closest_nodes(target_id=target_uid, n=2)
         self.assertEqual(len(closest_nodes), 0)
-        
+
+    def test_public_consensus_restart(self):
+        """
+        Test that a new public IP consensus re-derives the UID and keeps the known nodes.
+        """
+        node = Node(UID(key="12" * 20), ip="127.0.0.2", port=1337)
+        self.routing_table.insert_node(node)
+
+        for i in range(21):
+            self.routing_table.update_public_consensus(f"10.0.0.{i}", "1.2.3.4")
+        self.routing_table.restart_thread.join(timeout=5)
+
+        self.assertEqual(self.routing_table.consensus_ip, "1.2.3.4")
+        self.assertNotEqual(self.routing_table.local_id, self.local_uid)
+        self.assertEqual(self.routing_table.get_all_nodes(), [node])
+        self.assertEqual(self.routing_table.find_closest_nodes(node.get_uid(), 1), [node])
+
+    def test_public_consensus_ignores_local_addresses(self):
+        """
+        Test that reported addresses which are not globally routable do not change the UID.
+        """
+        for addr in ("192.168.1.10", "127.0.0.1", "fd00::1", "not an address"):
+            for i in range(21):
+                self.routing_table.update_public_consensus(f"10.0.0.{i}", addr)
+        self.assertIsNone(self.routing_table.restart_thread)
+        self.assertEqual(self.routing_table.local_id, self.local_uid)
+
+    def test_verify_uid(self):
+        """
+        Test that IDs derived from an IP verify against that IP only.
+        """
+        self.routing_table.consensus_ip = "1.2.3.4"
+        for _ in range(20):
+            self.routing_table.derive_uid()
+            uid = self.routing_table.uid
+            self.assertTrue(verify_uid(uid, "1.2.3.4"))
+            self.assertTrue(verify_uid(uid, "1.2.200.200"))  # Same prefix
+            self.assertFalse(verify_uid(uid, "5.6.7.8"))
+
+        self.routing_table.consensus_ip = "2a00:1450:4001:2::1"
+        self.routing_table.derive_uid()
+        self.assertTrue(verify_uid(self.routing_table.uid, "2a00:1450:4001:2::ffff"))
+        self.assertFalse(verify_uid(self.routing_table.uid, "2a03:2880::1"))
+
+    def test_verify_uid_exempt(self):
+        """
+        Test that local addresses are exempt and invalid addresses fail.
+        """
+        self.assertTrue(verify_uid(self.local_uid, "127.0.0.1"))
+        self.assertTrue(verify_uid(self.local_uid, "192.168.1.1"))
+        self.assertTrue(verify_uid(self.local_uid, "::1"))
+        self.assertFalse(verify_uid(self.local_uid, "not an ip"))
+
+    def test_insecure_node_downranked(self):
+        """
+        Test that nodes whose ID does not match their IP fill free slots but give way to trusted nodes.
+        """
+        node = Node(UID(key="12" * 20), ip="5.6.7.8", port=1337)
+        self.assertTrue(self.routing_table.insert_node(node))
+        bucket = self.routing_table.kbuckets[self.routing_table._get_bucket_index(node.get_uid())]
+        self.assertEqual(bucket.get_all_nodes(), [node])
+
+        trusted = [Node(UID(key="13" + f"{i:02x}" * 19), ip=f"127.0.0.{i + 2}", port=1337) for i in range(KBucket.MAX_BUCKET_SIZE)]
+        for trusted_node in trusted:
+            self.routing_table.insert_node(trusted_node)
+        self.assertCountEqual(bucket.get_all_nodes(), trusted)
+        self.assertEqual(bucket.cache, [node])
+
+    def test_insecure_nodes_are_used(self):
+        """
+        Test that lookups still find nodes when none of them has a secure ID.
+        """
+        nodes = [Node(UID(key=f"{i:02x}" * 20), ip=f"5.6.7.{i}", port=1337) for i in range(1, 51)]
+        for node in nodes:
+            self.routing_table.insert_node(node)
+        self.assertEqual(len(self.routing_table.find_closest_nodes(UID(key="ab" * 20), 8)), 8)
+
+    def test_insecure_node_rejected(self):
+        """
+        Test that nodes whose ID does not match their IP are rejected.
+        """
+        routing_table = RoutingTable(local_id=self.local_uid, secure_ids=SECURE_REJECT)
+        self.assertFalse(routing_table.insert_node(Node(UID(key="12" * 20), ip="5.6.7.8", port=1337)))
+        self.assertEqual(routing_table.get_all_nodes(), [])
+
+        routing_table.consensus_ip = "5.6.7.8"
+        routing_table.derive_uid()
+        secure_node = Node(routing_table.uid, ip="5.6.7.8", port=1337)
+        self.assertTrue(routing_table.insert_node(secure_node))
+        self.assertEqual(routing_table.get_all_nodes(), [secure_node])
+
 if __name__ == '__main__':
     unittest.main()
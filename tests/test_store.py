@@ -0,0 +1,77 @@
+import random
+import unittest
+from pydemlia.routing.table import RoutingTable
+from pydemlia.storage.store import LocalStore
+from pydemlia.utils.uid import UID
+
+class TestLocalStore(unittest.TestCase):
+    def setUp(self):
+        """
+        Fill a store with random keys.
+        """
+        self.random = random.Random(7)
+        self.store = LocalStore()
+        self.keys = [UID(bid=self.random.randbytes(UID.ID_LENGTH)) for _ in range(200)]
+        for i, key in enumerate(self.keys):
+            self.store[key] = i
+
+    def test_set_get_delete(self):
+        """
+        Test the mapping interface and that the index follows it.
+        """
+        key = self.keys[0]
+        self.assertIn(key, self.store)
+        self.assertEqual(self.store[key], 0)
+        self.store[key] = "updated"
+        self.assertEqual(len(self.store.index), 200)
+
+        del self.store[key]
+        self.assertNotIn(key, self.store)
+        self.assertEqual(len(self.store), 199)
+        self.assertNotIn(key.get_int(), self.store.index)
+        self.assertEqual(self.store.keys(), sorted(self.keys[1:]))
+
+    def test_range(self):
+        """
+        Test scanning keys by integer value.
+        """
+        lo, hi = sorted(self.random.getrandbits(160) for _ in range(2))
+        expected = sorted(key for key in self.keys if lo <= key.get_int() < hi)
+        self.assertEqual(self.store.range(lo, hi), expected)
+
+    def test_xor_range(self):
+        """
+        Test scanning keys by XOR distance against a brute force scan.
+        """
+        for _ in range(20):
+            target = UID(bid=self.random.randbytes(UID.ID_LENGTH))
+            lo, hi = sorted(self.random.getrandbits(160) for _ in range(2))
+            expected = {key for key in self.keys if lo <= key.get_int() ^ target.get_int() < hi}
+            self.assertEqual(set(self.store.xor_range(target, lo, hi)), expected)
+
+    def test_bucket(self):
+        """
+        Test that bucket scans match the routing table's bucket assignment.
+        """
+        local_id = UID(bid=self.random.randbytes(UID.ID_LENGTH))
+        table = RoutingTable(local_id)
+        self.store[local_id] = "local"
+
+        found = []
+        for index in range(len(table.kbuckets)):
+            keys = self.store.bucket(local_id, index)
+            self.assertTrue(all(table._get_bucket_index(key) == index for key in keys))
+            found.extend(keys)
+        self.assertEqual(sorted(found), sorted(self.keys + [local_id]))
+
+    def test_with_bit(self):
+        """
+        Test scanning keys by a single bit against a brute force scan.
+        """
+        for bit in (0, 7, 80, 158, 159):
+            for value in (0, 1):
+                expected = sorted(key for key in self.keys if (key.get_int() >> bit) & 1 == value)
+                self.assertEqual(self.store.with_bit(bit, value), expected)
+
+if __name__ == '__main__':
+    unittest.main()
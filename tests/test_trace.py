@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+import bencoder
+from pydemlia.network import ReplayNetwork
+from pydemlia.utils.trace import TraceWriter, read_trace, replay
+
+class TestTrace(unittest.TestCase):
+    def setUp(self):
+        """
+        Capture a small trace with IPv4 and IPv6 sources.
+        """
+        fd, self.path = tempfile.mkstemp(suffix=".trace")
+        os.close(fd)
+        self.records = [
+            (1000.0, bencoder.bencode({"operation": "PING"}), ("127.0.0.1", 1337)),
+            (1000.05, bencoder.bencode({"operation": "STORE", "key": "k", "value": 1}), ("::1", 7331)),
+            (1000.1, b"garbage", ("10.0.0.1", 1)),
+        ]
+        with TraceWriter(self.path) as trace:
+            for timestamp, data, addr in self.records:
+                trace.write(data, addr, timestamp)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_read_trace(self):
+        """
+        Test that records are read back unchanged and in order.
+        """
+        self.assertEqual(list(read_trace(self.path)), self.records)
+
+    def test_invalid_trace(self):
+        """
+        Test that files without the trace header are rejected.
+        """
+        with open(self.path, "wb") as file:
+            file.write(b"something else")
+        with self.assertRaises(ValueError):
+            list(read_trace(self.path))
+
+    def test_replay_through_network(self):
+        """
+        Test replaying a trace through the message pipeline.
+        """
+        network = ReplayNetwork()
+        received = []
+        network.register_handler("PING", lambda message, addr: received.append((message["operation"], addr)))
+        network.register_handler("STORE", lambda message, addr: network.send({"operation": "STORE_RESPONSE"}, addr))
+
+        report = replay(self.path, network.handle_message, profile=True, trace_memory=True)
+        self.assertEqual(report.messages, 3)
+        self.assertEqual(received, [("PING", ("127.0.0.1", 1337))])
+        self.assertEqual(network.sent, 1)
+        self.assertIsNotNone(report.profile)
+        self.assertIsNotNone(report.memory_peak)
+
+    def test_replay_paced(self):
+        """
+        Test that paced replays take at least the recorded duration.
+        """
+        report = replay(self.path, lambda data, addr: None, paced=True)
+        self.assertGreaterEqual(report.elapsed, 0.1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,244 @@
+import os
+import socket
+import threading
+import unittest
+import bencoder
+from pydemlia.dht import DHT
+from pydemlia.transport.asyncio_udp import AsyncioUDPTransport
+from pydemlia.transport.loopback import LoopbackHub
+from pydemlia.utils.node import Node
+from pydemlia.utils.uid import UID
+
+class TestLoopback(unittest.TestCase):
+    def setUp(self):
+        """
+        Create a hub with two attached transports.
+        """
+        self.hub = LoopbackHub()
+        self.a = self.hub.create_transport()
+        self.b = self.hub.create_transport()
+        self.received = []
+        self.b.register_handler("PING", lambda message, addr: self.received.append((message, addr)))
+        self.a.register_handler("PONG", lambda message, addr: self.received.append((message, addr)))
+
+    def test_zero_copy_delivery(self):
+        """
+        Test that messages are delivered in order and without copies.
+        """
+        messages = [{"operation": "PING", "n": i} for i in range(3)]
+        for message in messages:
+            self.a.send(message, self.b.addr)
+        self.assertEqual(self.received, [])
+        self.assertEqual(self.hub.run(), 3)
+        self.assertTrue(all(received is sent for (received, _), sent in zip(self.received, messages)))
+        self.assertEqual({addr for _, addr in self.received}, {self.a.addr})
+
+    def test_replies_are_delivered(self):
+        """
+        Test that messages sent by handlers are delivered within the same run.
+        """
+        self.b.register_handler("PING", lambda message, addr: self.b.send({"operation": "PONG"}, addr))
+        self.a.send({"operation": "PING"}, self.b.addr)
+        self.assertEqual(self.hub.run(), 2)
+        self.assertEqual(self.received, [({"operation": "PONG"}, self.b.addr)])
+
+    def test_deterministic_loss(self):
+        """
+        Test that message loss is reproducible for a given seed.
+        """
+        def run(seed):
+            hub = LoopbackHub(loss=0.5, seed=seed)
+            a, b = hub.create_transport(), hub.create_transport()
+            delivered = []
+            b.register_handler("PING", lambda message, addr: delivered.append(message["n"]))
+            for i in range(100):
+                a.send({"operation": "PING", "n": i}, b.addr)
+            hub.run()
+            return delivered
+
+        self.assertEqual(run(1), run(1))
+        self.assertLess(len(run(1)), 100)
+
+    def test_detached_transport(self):
+        """
+        Test that messages to detached or unknown addresses are dropped.
+        """
+        self.b.shutdown()
+        self.a.send({"operation": "PING"}, self.b.addr)
+        self.a.send({"operation": "PING"}, ("10.0.0.1", 1))
+        self.hub.run()
+        self.assertEqual(self.hub.dropped, 2)
+        with self.assertRaises(ValueError):
+            self.hub.create_transport(self.a.addr)
+
+    def test_encoded_delivery(self):
+        """
+        Test that an encoding hub delivers messages as the UDP transports decode them.
+        """
+        hub = LoopbackHub(encode=True)
+        a, b = hub.create_transport(), hub.create_transport()
+        b.register_handler("PING", lambda message, addr: self.received.append(message))
+        a.send({"operation": "PING", "value": "abc", "nested": {"n": [1, "x"]}}, b.addr)
+        hub.run()
+        self.assertEqual(self.received, [{"operation": "PING", "value": b"abc", "nested": {"n": [1, b"x"]}}])
+
+        with self.assertRaises(bencoder.BTFailure):
+            a.send({"operation": "PING", "key": UID(key="1" * 40)}, b.addr)
+        with self.assertRaises(ValueError):
+            a.send({"operation": "PING", "value": b"x" * 70000}, b.addr)
+
+class TestLoopbackDHT(unittest.TestCase):
+    def setUp(self):
+        """
+        Create a hub encoding messages like the UDP transports.
+        """
+        self.hub = LoopbackHub(encode=True)
+
+    def create_dhts(self, n):
+        """
+        Create n DHT nodes on the hub that know each other and negotiated compression.
+        """
+        dhts = []
+        for _ in range(n):
+            transport = self.hub.create_transport()
+            node = Node(UID(bid=os.urandom(UID.ID_LENGTH)), ip=transport.addr[0], port=transport.addr[1])
+            dhts.append(DHT(node=node, network=transport))
+        for dht in dhts:
+            for other in dhts:
+                if other is not dht:
+                    dht.insert_node(other.node)
+                    dht.ping(other.node)
+        self.hub.run()
+        return dhts
+
+    def test_dht_large_value(self):
+        """
+        Test storing and reading a chunked value between DHT nodes on the hub.
+        """
+        dhts = self.create_dhts(4)
+        value = os.urandom(5000) + b"a" * 5000
+        key = UID(bid=os.urandom(UID.ID_LENGTH))
+        dhts[0].put(key, value)
+        self.hub.run()
+
+        self.hub.start()
+        try:
+            self.assertEqual(dhts[1].get(key), value)
+        finally:
+            self.hub.stop()
+        self.assertGreater(sum(stats.count for stats in dhts[0].compressor.stats.values()), 0)
+
+    def test_dht_wire_types(self):
+        """
+        Test that values come back with the types the UDP transports produce, compressed or not.
+        """
+        dhts = self.create_dhts(3)
+        dhts[0].put("short", "abc")
+        dhts[0].put("long", ["abc"] * 100)
+        self.hub.run()
+
+        self.hub.start()
+        try:
+            self.assertEqual(dhts[1].get("short"), b"abc")
+            self.assertEqual(dhts[1].get("long"), [b"abc"] * 100)
+        finally:
+            self.hub.stop()
+
+    def test_dht_manifest_lookalike(self):
+        """
+        Test that user values shaped like a manifest, and small bytes-like values, are stored as they are.
+        """
+        dhts = self.create_dhts(3)
+        dhts[0].put("doc", {"manifest": "v1", "title": "x"})
+        dhts[0].put("bytearray", bytearray(b"abc"))
+        dhts[0].put("memoryview", memoryview(b"abc"))
+        self.hub.run()
+
+        self.hub.start()
+        try:
+            self.assertEqual(dhts[1].get("doc"), {"manifest": b"v1", "title": b"x"})
+            self.assertEqual(dhts[1].get("bytearray"), b"abc")
+            self.assertEqual(dhts[1].get("memoryview"), b"abc")
+        finally:
+            self.hub.stop()
+
+    def test_dht_concurrent_fetches(self):
+        """
+        Test that concurrent fetches sharing chunks all complete.
+        """
+        dhts = self.create_dhts(4)
+        value = b"\x00" * 20000  # Every chunk has the same digest
+        dhts[0].put("zeros", value)
+        self.hub.run()
+
+        results = []
+        self.hub.start()
+        try:
+            threads = [threading.Thread(target=lambda: results.append(dhts[1].get("zeros"))) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            self.hub.stop()
+        self.assertEqual(results, [value, value])
+        self.assertEqual(dhts[1].pending_chunks, {})
+
+    def test_dht_large_structured_value(self):
+        """
+        Test that values which are not bytes-like are chunked by their encoded size.
+        """
+        dhts = self.create_dhts(4)
+        value = {"items": [os.urandom(32) for _ in range(200)]}
+        dhts[0].put("list", value)
+        self.hub.run()
+        self.assertTrue(all(len(bencoder.bencode(v)) < 2048 for dht in dhts for v in dht.data_store.values.values()))
+
+        self.hub.start()
+        try:
+            self.assertEqual(dhts[1].get("list"), value)
+        finally:
+            self.hub.stop()
+
+class TestAsyncioUDP(unittest.TestCase):
+    def test_roundtrip(self):
+        """
+        Test that datagrams are decoded, dispatched and answered on the event loop.
+        """
+        transport = AsyncioUDPTransport(host="127.0.0.1", port=0)
+        transport.register_handler("PING", lambda message, addr: transport.send({"operation": "PONG"}, addr))
+        thread = threading.Thread(target=transport.receive)
+        thread.start()
+        try:
+            self.assertTrue(transport.ready.wait(5))
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as client:
+                client.settimeout(5)
+                client.sendto(bencoder.bencode({"operation": "PING"}), ("127.0.0.1", transport.port))
+                data, _ = client.recvfrom(1024)
+            self.assertEqual(bencoder.bdecode(data), {b"operation": b"PONG"})
+        finally:
+            transport.shutdown()
+            thread.join()
+
+    def test_send_before_start(self):
+        """
+        Test that messages sent before the socket is bound are sent once it is, and that send does not raise.
+        """
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as client:
+            client.bind(("127.0.0.1", 0))
+            client.settimeout(5)
+            transport = AsyncioUDPTransport(host="127.0.0.1", port=0)
+            transport.send({"operation": "PING"}, client.getsockname())
+            transport.send({"operation": "PING", "bad": 1.5}, client.getsockname())
+            thread = threading.Thread(target=transport.receive)
+            thread.start()
+            try:
+                data, _ = client.recvfrom(1024)
+                self.assertEqual(bencoder.bdecode(data), {b"operation": b"PING"})
+                transport.send({"operation": "PING"}, ("::1", 1))  # Wrong family for the socket
+            finally:
+                transport.shutdown()
+                thread.join()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -63,5 +63,11 @@ class TestUID(unittest.TestCase):
         # Test UID hashing
         self.assertIsInstance(hash(self.uid), int)
 
+    def test_from_key(self):
+        # Test hashing keys onto the key space
+        self.assertIs(UID.from_key(self.uid), self.uid)
+        self.assertEqual(UID.from_key("test"), UID.from_key(b"test"))
+        self.assertEqual(UID.from_key("test").get_hex(), "A94A8FE5CCB19BA61C4C0873D391E987982FBBD3")
+
 if __name__ == '__main__':
     unittest.main()